@@ -0,0 +1,207 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pygame
+from materials import EMPTY, SAND
+from particle import COLOR_VARIANTS
+from simulation import Simulation
+from replay import digest
+
+# Headless benchmark for Simulation.update and Grid.draw.
+#
+#   python benchmark.py --ticks 300 --engine classic vectorized > run.json
+#
+# Scenarios:
+#   strokes    paints the same scripted strokes, then lets the sand settle
+#   half-full  the bottom half is a settled pile and sand rains onto it
+#
+#   python benchmark.py --scenario half-full --skip-piles on off
+#
+# compares the update time with and without skipping the settled pile.
+#
+#   python benchmark.py --check-piles --engine classic vectorized
+#
+# plays every run with the pile skipped and not skipped and checks the final
+# grids are the same, which they are when no moving cell is ever skipped.
+# Results are printed as JSON so two runs can be diffed or compared by a
+# script. Every run is seeded with --seed, so the same arguments give the
+# same final grid.
+
+SIZES = ["800x600x10", "800x600x4", "1000x1000x1", "1920x1080x1"]
+
+# (mode, start, end) with positions as (row, column) fractions of the grid
+STROKES = [
+    ("rock", (0.75, 0.1), (0.8, 0.7)),
+    ("sand", (0.05, 0.2), (0.05, 0.8)),
+    ("erase", (0.77, 0.3), (0.78, 0.45)),
+    ("sand", (0.3, 0.9), (0.05, 0.5)),
+]
+
+def stroke_position(simulation, stroke, tick, stroke_ticks):
+    _, start, end = STROKES[stroke]
+    progress = (tick % stroke_ticks) / max(stroke_ticks - 1, 1)
+    row = start[0] + (end[0] - start[0]) * progress
+    column = start[1] + (end[1] - start[1]) * progress
+    return int(row * simulation.grid.rows), int(column * simulation.grid.columns)
+
+def paint_strokes(simulation, tick, stroke_ticks):
+    stroke = tick // stroke_ticks
+    if stroke >= len(STROKES):
+        return
+    simulation.mode = STROKES[stroke][0]
+    # Joined up with the previous position of the same stroke, like the mouse
+    previous = None
+    if tick % stroke_ticks:
+        previous = stroke_position(simulation, stroke, tick - 1, stroke_ticks)
+    row, column = stroke_position(simulation, stroke, tick, stroke_ticks)
+    simulation.apply_brush(row, column, previous)
+
+def fill_half(simulation):
+    grid = simulation.grid
+    half = grid.rows // 2
+    grid.materials[half:] = SAND
+    grid.variants[half:] = simulation.random.integers(COLOR_VARIANTS, grid.variants[half:].shape, np.uint8)
+    grid.mark_all()
+
+def rain(simulation, tick, stroke_ticks):
+    # A few grains along the top row every tick
+    grid = simulation.grid
+    simulation.mode = "sand"
+    grid.paint(0, 0, simulation.random.random_array((1, grid.columns)) < 0.05, SAND)
+
+SCENARIOS = {
+    "strokes": (None, paint_strokes),
+    "half-full": (fill_half, rain),
+}
+
+def run(engine, width, height, cell_size, ticks, workers, scenario="strokes", skip_piles=True, seed=0):
+    window = pygame.display.set_mode((width, height))
+    simulation = Simulation(width, height, cell_size, engine, workers, seed)
+    simulation.brush.radius = max(1, simulation.grid.columns // 80)
+    simulation.skip_piles = skip_piles
+    stroke_ticks = max(ticks // (2 * len(STROKES)), 1)
+    setup, paint = SCENARIOS[scenario]
+    if setup is not None:
+        setup(simulation)
+
+    tracemalloc.reset_peak()
+    update_time = 0.0
+    draw_time = 0.0
+    for tick in range(ticks):
+        paint(simulation, tick, stroke_ticks)
+
+        began = time.perf_counter()
+        simulation.update()
+        update_time += time.perf_counter() - began
+
+        window.fill((29, 29, 29))
+        began = time.perf_counter()
+        simulation.grid.draw(window)
+        draw_time += time.perf_counter() - began
+    peak = tracemalloc.get_traced_memory()[1]
+
+    grid = simulation.grid
+    result = {
+        "engine": engine,
+        "scenario": scenario,
+        "skip_piles": skip_piles,
+        "width": width,
+        "height": height,
+        "cell_size": cell_size,
+        "rows": grid.rows,
+        "columns": grid.columns,
+        "ticks": ticks,
+        "particles": int(np.count_nonzero(grid.materials != EMPTY)),
+        "update_ms_per_tick": update_time / ticks * 1000,
+        "draw_ms_per_tick": draw_time / ticks * 1000,
+        "cells_per_second": grid.rows * grid.columns * ticks / update_time if update_time else None,
+        "peak_memory_bytes": peak,
+        # Same seed and input give the same digest, whatever the machine
+        "digest": digest(grid),
+    }
+    simulation.close()
+    return result
+
+def check_piles(engines, sizes, scenarios, ticks, workers, seed):
+    # Returns the runs where skipping the pile changed the outcome
+    failures = []
+    for scenario in scenarios:
+        for engine in engines:
+            for size in sizes:
+                width, height, cell_size = parse_size(size)
+                skipped, stepped = (run(engine, width, height, cell_size, ticks, workers, scenario, skip_piles, seed)
+                                    for skip_piles in (True, False))
+                if skipped["digest"] != stepped["digest"]:
+                    failures.append(f"{scenario} {engine} {size}: {skipped['digest']} with the pile skipped, "
+                                    f"{stepped['digest']} without")
+    return failures
+
+def parse_size(text):
+    width, height, cell_size = (int(part) for part in text.lower().split("x"))
+    return width, height, cell_size
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless falling sand benchmark")
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--engine", nargs="+", default=["vectorized"],
+                        choices=["classic", "vectorized", "parallel"])
+    parser.add_argument("--size", nargs="+", default=SIZES, help="WIDTHxHEIGHTxCELL_SIZE")
+    parser.add_argument("--scenario", nargs="+", default=["strokes"], choices=list(SCENARIOS))
+    parser.add_argument("--skip-piles", nargs="+", default=["on"], choices=["on", "off"])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    parser.add_argument("--check-piles", action="store_true",
+                        help="check skipping the pile gives the same grid instead of timing")
+    args = parser.parse_args()
+
+    pygame.init()
+    if args.check_piles:
+        failures = check_piles(args.engine, args.size, args.scenario, args.ticks, args.workers, args.seed)
+        pygame.quit()
+        for failure in failures:
+            print(failure, file=sys.stderr)
+        if failures:
+            sys.exit(1)
+        print("skipping the pile changes nothing")
+        return
+    tracemalloc.start()
+    results = []
+    for scenario in args.scenario:
+        for skip_piles in args.skip_piles:
+            for engine in args.engine:
+                for size in args.size:
+                    width, height, cell_size = parse_size(size)
+                    results.append(run(engine, width, height, cell_size, args.ticks, args.workers,
+                                       scenario, skip_piles == "on", args.seed))
+                    print(f"{scenario} piles {skip_piles} {engine} {size}: "
+                          f"{results[-1]['update_ms_per_tick']:.2f} ms update, "
+                          f"{results[-1]['draw_ms_per_tick']:.2f} ms draw", file=sys.stderr)
+    tracemalloc.stop()
+    pygame.quit()
+
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pygame": pygame.version.ver,
+        "machine": platform.machine(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seed": args.seed,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import numpy as np
+
+MAX_RADIUS = 64
+
+# A stroke covers every cell within radius of the segment between the last
+# and the current mouse position, so fast strokes leave no gaps. The
+# footprint is built as one mask over its bounding box and painted onto the
+# grid in one go.
+
+def stroke_footprint(start, end, radius, rows, columns):
+    # Returns (top, left, mask) with the mask clipped to the grid, or None
+    # when the stroke lies entirely outside it
+    radius = min(max(radius, 0), MAX_RADIUS)
+    start_row, start_column = start
+    end_row, end_column = end
+    top = max(min(start_row, end_row) - radius, 0)
+    left = max(min(start_column, end_column) - radius, 0)
+    bottom = min(max(start_row, end_row) + radius + 1, rows)
+    right = min(max(start_column, end_column) + radius + 1, columns)
+    if top >= bottom or left >= right:
+        return None
+
+    cell_rows = np.arange(top, bottom, dtype=np.float32)[:, None] - start_row
+    cell_columns = np.arange(left, right, dtype=np.float32)[None, :] - start_column
+    delta_row = end_row - start_row
+    delta_column = end_column - start_column
+    length = delta_row * delta_row + delta_column * delta_column
+    if length:
+        # Distance to the closest point of the segment
+        along = np.clip((cell_rows * delta_row + cell_columns * delta_column) / length, 0, 1)
+        cell_rows = cell_rows - along * delta_row
+        cell_columns = cell_columns - along * delta_column
+    mask = cell_rows * cell_rows + cell_columns * cell_columns <= (radius + 0.5) ** 2
+    return top, left, mask
+
+class Brush:
+    def __init__(self, radius=1):
+        self.radius = radius
+        # Cell of the previous sample while the button is held
+        self.last = None
+
+    def segment(self, row, column):
+        # (start, end) cells of the stroke up to this sample
+        start = self.last if self.last is not None else (row, column)
+        self.last = (row, column)
+        return start, (row, column)
+
+    def stroke(self, row, column, rows, columns):
+        start, end = self.segment(row, column)
+        return stroke_footprint(start, end, self.radius, rows, columns)
+
+    def release(self):
+        self.last = None
+
+    def resize(self, change):
+        self.radius = min(max(self.radius + change, 0), MAX_RADIUS)
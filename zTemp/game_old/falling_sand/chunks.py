@@ -0,0 +1,149 @@
+import numpy as np
+
+CHUNK_SIZE = 16
+CLEAN = np.iinfo(np.int32).max
+
+class ChunkMap:
+    def __init__(self, rows, columns, chunk_size=CHUNK_SIZE):
+        self.rows = rows
+        self.columns = columns
+        self.chunk_size = chunk_size
+        self.chunk_rows = -(-rows // chunk_size)
+        self.chunk_columns = -(-columns // chunk_size)
+        shape = (self.chunk_rows, self.chunk_columns)
+        # Chunks to simulate this tick, and chunks where something changed
+        # this tick. A chunk stays awake for the next tick only if it or one
+        # of its neighbors changed.
+        self.awake = np.ones(shape, dtype=bool)
+        self.touched = np.zeros(shape, dtype=bool)
+        # Dirty rectangle per chunk in cell coordinates, waiting to be drawn.
+        # A clean chunk has an inverted rectangle, so growing it is just a
+        # min/max with the new cells.
+        self.top = np.full(shape, CLEAN, dtype=np.int32)
+        self.left = np.full(shape, CLEAN, dtype=np.int32)
+        self.bottom = np.zeros(shape, dtype=np.int32)
+        self.right = np.zeros(shape, dtype=np.int32)
+        self.mark_all()
+
+    def mark_all(self):
+        size = self.chunk_size
+        self.top[:] = np.arange(self.chunk_rows)[:, None] * size
+        self.left[:] = np.arange(self.chunk_columns)[None, :] * size
+        self.bottom[:] = np.minimum(self.top + size, self.rows)
+        self.right[:] = np.minimum(self.left + size, self.columns)
+        self.touched[:] = True
+        self.awake[:] = True
+
+    def mark(self, row, column):
+        chunk_row = row // self.chunk_size
+        chunk_column = column // self.chunk_size
+        self.top[chunk_row, chunk_column] = min(self.top[chunk_row, chunk_column], row)
+        self.left[chunk_row, chunk_column] = min(self.left[chunk_row, chunk_column], column)
+        self.bottom[chunk_row, chunk_column] = max(self.bottom[chunk_row, chunk_column], row + 1)
+        self.right[chunk_row, chunk_column] = max(self.right[chunk_row, chunk_column], column + 1)
+        self.touched[chunk_row, chunk_column] = True
+        # Wake the neighbors right away too, a grain placed at the edge of a
+        # chunk can move into them this very tick
+        self.awake[max(chunk_row - 1, 0):chunk_row + 2, max(chunk_column - 1, 0):chunk_column + 2] = True
+
+    def mark_changed(self, changed, row, column, wake=False):
+        # Bulk version of mark for a mask of changed cells whose top left
+        # corner sits at (row, column). wake also wakes the chunks around the
+        # changed ones right away, like mark does.
+        size = self.chunk_size
+        row_offset = row % size
+        column_offset = column % size
+        row -= row_offset
+        column -= column_offset
+        rows = changed.shape[0] + row_offset
+        columns = changed.shape[1] + column_offset
+        chunk_rows = -(-rows // size)
+        chunk_columns = -(-columns // size)
+        padded = np.zeros((chunk_rows * size, chunk_columns * size), dtype=bool)
+        padded[row_offset:rows, column_offset:columns] = changed
+        blocks = padded.reshape(chunk_rows, size, chunk_columns, size)
+        changed_rows = blocks.any(axis=3)
+        changed_columns = blocks.any(axis=1)
+        touched = changed_rows.any(axis=1)
+        if not touched.any():
+            return
+
+        first_row = row // size
+        first_column = column // size
+        window = (slice(first_row, first_row + chunk_rows), slice(first_column, first_column + chunk_columns))
+        top = row + np.arange(chunk_rows)[:, None] * size + changed_rows.argmax(axis=1)
+        bottom = row + np.arange(1, chunk_rows + 1)[:, None] * size - changed_rows[:, ::-1].argmax(axis=1)
+        left = column + np.arange(chunk_columns)[None, :] * size + changed_columns.argmax(axis=2)
+        right = column + np.arange(1, chunk_columns + 1)[None, :] * size - changed_columns[:, :, ::-1].argmax(axis=2)
+
+        np.minimum(self.top[window], np.where(touched, top, CLEAN), out=self.top[window])
+        np.minimum(self.left[window], np.where(touched, left, CLEAN), out=self.left[window])
+        np.maximum(self.bottom[window], np.where(touched, bottom, 0), out=self.bottom[window])
+        np.maximum(self.right[window], np.where(touched, right, 0), out=self.right[window])
+        self.touched[window] |= touched
+
+        if wake:
+            touched_rows = np.flatnonzero(touched.any(axis=1)) + first_row
+            touched_columns = np.flatnonzero(touched.any(axis=0)) + first_column
+            self.awake[max(touched_rows[0] - 1, 0):touched_rows[-1] + 2,
+                       max(touched_columns[0] - 1, 0):touched_columns[-1] + 2] = True
+
+    def end_tick(self):
+        # A chunk sleeps once neither it nor any neighbor changed
+        padded = np.pad(self.touched, 1)
+        self.awake[:] = False
+        for row in range(3):
+            for column in range(3):
+                self.awake |= padded[row:row + self.chunk_rows, column:column + self.chunk_columns]
+        self.touched[:] = False
+
+    def awake_windows(self):
+        # Cell rectangles (top, left, bottom, right) covering every awake
+        # chunk, empty when the whole grid is asleep
+        return windows(self.awake, self.chunk_size, self.rows, self.columns)
+
+    def awake_columns(self):
+        # Per chunk row, a mask of the cell columns that lie in awake chunks
+        return np.repeat(self.awake, self.chunk_size, axis=1)[:, :self.columns]
+
+    def pop_dirty(self):
+        dirty = np.nonzero(self.bottom > self.top)
+        rects = list(zip(self.top[dirty].tolist(), self.left[dirty].tolist(),
+                         self.bottom[dirty].tolist(), self.right[dirty].tolist()))
+        self.top[dirty] = CLEAN
+        self.left[dirty] = CLEAN
+        self.bottom[dirty] = 0
+        self.right[dirty] = 0
+        return rects
+
+def runs(mask):
+    # (start, stop) of every run of set entries
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+def windows(chunks, chunk_size, rows, columns):
+    # Cuts the set chunks into cell rectangles along the chunk rows and
+    # columns that have none set, again inside every piece until no piece
+    # can be cut. Two rectangles are at least a chunk apart, so nothing in
+    # one can reach the other within a tick and they can be stepped one
+    # after the other. Two busy spots far apart cost their own areas, not
+    # the area between them.
+    found = []
+    pending = [(0, 0, chunks.shape[0], chunks.shape[1])]
+    while pending:
+        top, left, bottom, right = pending.pop()
+        block = chunks[top:bottom, left:right]
+        row_runs = runs(block.any(axis=1))
+        column_runs = runs(block.any(axis=0))
+        if not row_runs:
+            continue
+        if len(row_runs) > 1:
+            pending.extend((top + start, left, top + stop, right) for start, stop in row_runs)
+        elif len(column_runs) > 1:
+            pending.extend((top, left + start, bottom, left + stop) for start, stop in column_runs)
+        else:
+            found.append((top + row_runs[0][0], left + column_runs[0][0],
+                          top + row_runs[0][1], left + column_runs[0][1]))
+    # Top to bottom, so random draws come in the same order every run
+    return [(top * chunk_size, left * chunk_size, min(bottom * chunk_size, rows), min(right * chunk_size, columns))
+            for top, left, bottom, right in sorted(found)]
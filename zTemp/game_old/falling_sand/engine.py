@@ -0,0 +1,310 @@
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+from materials import (EMPTY, FLAGS, DENSITY, DECAY_CHANCE, DECAY_INTO, REACT_CHANCE, REACT_INTO,
+                       FALL, SLIDE, FLOW, RISE, DRIFT, MOVING, STATIC, DECAYS, REACTS, present)
+
+# Whole-grid step built from NumPy array operations, driven by the material
+# table in materials.py. Which materials are present is found once per tick
+# and each pass only looks at the materials with its rule, so materials in
+# the table but not in the grid cost nothing.
+#
+# 1. Vertical falls: like the row by row loop in Simulation, a run of falling
+#    cells standing on an empty cell drops by one row as a block. Rising
+#    materials do the same upwards.
+# 2. Sinking: a falling cell swaps with a lighter one below it, a rising cell
+#    with a heavier one above it.
+# 3. Diagonal slides: resting cells try down-left and down-right, or up-left
+#    and up-right for rising materials. All cells in a row try the same side
+#    first and that side alternates with row and tick parity, so no per-cell
+#    random roll is needed.
+# 4. Sideways flow: resting liquids and gases try left and right the same way.
+# 5. Decay and reactions roll per cell, only for materials that have them.
+#
+# Cells only ever swap places, so moving conserves mass. Each pass moves cells
+# out of one row or column parity only, so no cell is both the source and the
+# target of a swap in the same pass.
+
+# The grid passed in can be a window of a larger one, parity is then the tick
+# count plus the row the window starts at so slide sides line up.
+
+default_rng = np.random.default_rng()
+
+def step(materials, variants, parity, changed=None, rng=None, open_top=False, open_bottom=False):
+    # Returns a mask of the cells that changed this tick: every cell a grain
+    # left or moved into. Grains in cells already marked in a changed mask
+    # passed in stay put, so a window can be stepped after a neighbor that
+    # spilled into it within the same tick.
+    #
+    # open_top and open_bottom say the window continues past that edge, so
+    # cells on it are not treated as resting against the edge.
+    if changed is None:
+        changed = np.zeros(materials.shape, dtype=bool)
+    if rng is None:
+        rng = default_rng
+    if materials.shape[0] < 2:
+        return changed
+    cells = Cells(materials, variants, changed)
+
+    if cells.flags & FALL:
+        shift_runs(cells, cells.having(FALL), 1)
+        sink(cells, FALL, 1, parity)
+    if cells.flags & RISE:
+        shift_runs(cells, cells.having(RISE), -1)
+        sink(cells, RISE, -1, parity)
+    if cells.flags & SLIDE:
+        slide(cells, SLIDE, 1, parity)
+    if cells.flags & DRIFT:
+        slide(cells, DRIFT, -1, parity)
+    if cells.flags & FLOW:
+        flow(cells, parity, open_top, open_bottom)
+    if cells.flags & DECAYS:
+        decay(cells, rng)
+    if cells.flags & REACTS:
+        react(cells, rng)
+    return changed
+
+class Cells:
+    # The planes a step works on and the materials present in them
+    def __init__(self, materials, variants, changed):
+        self.materials = materials
+        self.variants = variants
+        self.changed = changed
+        self.masks = {}
+        self.present = present(materials)
+        self.flags = 0
+        for material in self.present:
+            self.flags |= int(FLAGS[material])
+        # With a single kind of moving material present every move is into
+        # an empty cell, densities are only looked up when there are more.
+        # Density moves along with the cells, static cells never move.
+        self.density = None
+        self.static = None
+        self.planes = (materials, variants)
+        if sum(1 for material in self.present if FLAGS[material] & MOVING) > 1:
+            self.density = np.take(DENSITY, materials, mode="clip")
+            self.static = self.having(STATIC)
+            self.planes = (materials, variants, self.density)
+
+    def having(self, bit):
+        # Cells of a material with this flag. The mask is built once per
+        # step, it goes stale only for cells marked changed.
+        if bit not in self.masks:
+            mask = np.zeros(self.materials.shape, dtype=bool)
+            for material in self.present:
+                if FLAGS[material] & bit:
+                    mask |= self.materials == material
+            self.masks[bit] = mask
+        return self.masks[bit]
+
+def shift_runs(cells, movers, direction):
+    # Rising runs are found by scanning the grid upside down, where they fall
+    materials = cells.materials
+    movers = movers & ~cells.changed
+    if direction < 0:
+        materials = materials[::-1]
+        movers = movers[::-1]
+    # Cells sitting right on top of an empty cell start a falling run.
+    # Nothing below the lowest of them can fall, so a settled pile at the
+    # bottom of the grid is left out of the scan.
+    starts = movers[:-1] & (materials[1:] == EMPTY)
+    start_rows = np.flatnonzero(starts.any(axis=1))
+    if len(start_rows) == 0:
+        return
+    bottom = start_rows[-1] + 2
+    block = movers[:bottom]
+
+    # Scanning up from the lowest row, remember the last non-moving cell
+    # seen. Its key grows with the scan order, so a running maximum keeps the
+    # nearest one, and the low bit says whether it is empty.
+    order = np.arange(2, 2 * bottom + 2, 2, dtype=key_type(bottom))[:, None]
+    key = order * ~block[::-1]
+    key += materials[bottom - 1::-1] == EMPTY
+    np.maximum.accumulate(key, axis=0, out=key)
+    falls = block & (key[::-1] & 1).astype(bool)
+
+    # Every cell of a falling run moves down one row, and the top cell of
+    # the run leaves an empty cell behind
+    vacated = falls.copy()
+    vacated[1:] &= ~falls[:-1]
+    moving = np.flatnonzero(falls)
+    vacated = np.flatnonzero(vacated)
+    width = materials.shape[1]
+    last_row = materials.shape[0] - 1 if direction < 0 else None
+
+    for plane in cells.planes + (cells.changed,):
+        flat, stride = flat_view(plane)
+        sources = cell_offsets(moving, width, stride, last_row=last_row)
+        tops = cell_offsets(vacated, width, stride, last_row=last_row)
+        if plane is cells.changed:
+            flat[sources + direction * stride] = True
+            flat[tops] = True
+            continue
+        flat[sources + direction * stride] = flat[sources]
+        # The empty material, and its density, are both zero
+        flat[tops] = EMPTY
+
+def flat_view(plane):
+    # 1-D view over the memory a plane spans, so cells can be moved by offset
+    # even when the plane is a window into a larger one and not contiguous
+    row_stride = plane.strides[0] // plane.itemsize
+    size = (plane.shape[0] - 1) * row_stride + plane.shape[1]
+    return as_strided(plane, shape=(size,), strides=(plane.itemsize,)), row_stride
+
+def cell_offsets(cells, width, stride, first_row=0, first_column=0, last_row=None):
+    # Offsets into a plane with this row stride of cells numbered row by row
+    # in a region width wide starting at first_row, first_column. last_row
+    # turns the numbering upside down, for masks built on a flipped grid.
+    if stride == width and last_row is None:
+        return cells + (first_row * stride + first_column)
+    rows, columns = np.divmod(cells, width)
+    if last_row is not None:
+        rows = last_row - rows
+    return (rows + first_row) * stride + (columns + first_column)
+
+def key_type(rows):
+    if 2 * rows + 2 <= np.iinfo(np.uint16).max:
+        return np.uint16
+    return np.uint32
+
+def span(offset):
+    # Cells whose neighbor at this offset is still inside the grid
+    if offset > 0:
+        return slice(0, -offset)
+    if offset < 0:
+        return slice(-offset, None)
+    return slice(None)
+
+def move(cells, bit, row_offset, column_offset, sources):
+    # Swaps the cells with this flag, among sources, with their neighbor at
+    # the offset where it can be entered: it is lighter for a sinking
+    # material, heavier for a floating one, not static, and nothing moved
+    # into it this tick. sources covers the cells whose neighbor is inside
+    # the grid, see span.
+    source = (span(row_offset), span(column_offset))
+    target = (span(-row_offset), span(-column_offset))
+    movers = sources & cells.having(bit)[source] & ~cells.changed[source]
+    if cells.density is None:
+        movers &= cells.materials[target] == EMPTY
+    moving = np.flatnonzero(movers)
+    if len(moving) == 0:
+        return
+    width = movers.shape[1]
+    first_row = max(-row_offset, 0)
+    first_column = max(-column_offset, 0)
+
+    if cells.density is not None:
+        # Only the few candidates are checked against their targets
+        offsets = {}
+        def flat(plane):
+            flat, stride = flat_view(plane)
+            if stride not in offsets:
+                sources = cell_offsets(moving, width, stride, first_row, first_column)
+                offsets[stride] = sources, sources + (row_offset * stride + column_offset)
+            return flat, offsets[stride]
+        density, (sources, targets) = flat(cells.density)
+        static, _ = flat(cells.static)
+        mover_density = density[sources]
+        target_density = density[targets]
+        enters = np.where(mover_density > 0, target_density < mover_density, target_density > mover_density)
+        enters &= ~static[targets]
+        changed, (sources, targets) = flat(cells.changed)
+        materials, _ = flat(cells.materials)
+        enters &= ~changed[targets] | (materials[targets] == EMPTY)
+        moving = moving[enters]
+
+    for plane in cells.planes + (cells.changed,):
+        flat, stride = flat_view(plane)
+        sources = cell_offsets(moving, width, stride, first_row, first_column)
+        targets = sources + (row_offset * stride + column_offset)
+        if plane is cells.changed:
+            flat[sources] = True
+            flat[targets] = True
+            continue
+        entered = flat[targets]
+        flat[targets] = flat[sources]
+        flat[sources] = entered
+
+def sink(cells, bit, direction, parity):
+    # A falling cell swaps with a lighter one below it, a rising cell with a
+    # heavier one above it. Source rows of one parity at a time, so the pairs
+    # never overlap.
+    if cells.density is None:
+        return
+    source_rows = np.arange(cells.materials.shape[0])[span(direction)]
+    for phase in (0, 1):
+        sources = ((source_rows + parity) % 2 == phase)[:, None]
+        move(cells, bit, direction, 0, sources)
+
+def side_passes(left_rows):
+    # Rows that try left first do so while the others try right, then the
+    # other way around. A pass moves cells out of rows of one parity only.
+    return ((left_rows, -1), (~left_rows, 1), (left_rows, 1), (~left_rows, -1))
+
+def slide(cells, bit, direction, parity):
+    # A cell that moved this tick, by falling or sliding, stays put. Only
+    # cells resting on something slide.
+    materials = cells.materials
+    if direction > 0:
+        resting = materials[1:] != EMPTY
+    else:
+        resting = materials[:-1] != EMPTY
+    source_rows = np.arange(materials.shape[0])[span(direction)]
+    left_rows = ((source_rows + parity) % 2 == 0)[:, None]
+    for rows, column_offset in side_passes(left_rows):
+        move(cells, bit, direction, column_offset, resting[:, span(column_offset)] & rows)
+
+def flow(cells, parity, open_top, open_bottom):
+    # Resting cells try left and right, from columns of one parity at a time
+    # so a cell never moves into one that is moving itself. Sinking materials
+    # rest on the cell below, floating ones on the cell above.
+    materials = cells.materials
+    rows, columns = materials.shape
+    resting = np.ones(materials.shape, dtype=bool)
+    for material in cells.present:
+        if FLAGS[material] & FLOW:
+            lying = materials == material
+            if DENSITY[material] > 0:
+                lying[:-1] &= materials[1:] == EMPTY
+                lying[-1] &= open_bottom
+            else:
+                lying[1:] &= materials[:-1] == EMPTY
+                lying[0] &= open_top
+            resting &= ~lying
+
+    left_rows = ((np.arange(rows) + parity) % 2 == 0)[:, None]
+    even_columns = np.arange(columns) % 2 == 0
+    for rows, column_offset in side_passes(left_rows):
+        for in_phase in (even_columns, ~even_columns):
+            sources = resting[:, span(column_offset)] & rows & in_phase[span(column_offset)]
+            move(cells, FLOW, 0, column_offset, sources)
+
+def decay(cells, rng):
+    rows, columns = np.nonzero(cells.having(DECAYS) & ~cells.changed)
+    current = cells.materials[rows, columns]
+    hits = rng.random(len(rows)) < DECAY_CHANCE[current]
+    cells.materials[rows[hits], columns[hits]] = DECAY_INTO[current[hits]]
+    # A decaying cell keeps its chunk awake until it is gone, even when it
+    # has nowhere to move
+    cells.changed[rows, columns] = True
+
+def react(cells, rng):
+    # Each reacting cell checks its four neighbors and the first one it
+    # reacts with decides what it turns into
+    materials = cells.materials
+    rows, columns = np.nonzero(cells.having(REACTS) & ~cells.changed)
+    current = materials[rows, columns]
+    result = current.copy()
+    reacted = np.zeros(len(rows), dtype=bool)
+    height, width = materials.shape
+    for row_offset, column_offset in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+        neighbor_rows = rows + row_offset
+        neighbor_columns = columns + column_offset
+        inside = ((neighbor_rows >= 0) & (neighbor_rows < height) &
+                  (neighbor_columns >= 0) & (neighbor_columns < width))
+        neighbors = np.full(len(rows), EMPTY, dtype=np.uint8)
+        neighbors[inside] = materials[neighbor_rows[inside], neighbor_columns[inside]]
+        hits = ~reacted & inside & (rng.random(len(rows)) < REACT_CHANCE[current, neighbors])
+        result[hits] = REACT_INTO[current[hits], neighbors[hits]]
+        reacted |= hits
+    materials[rows[reacted], columns[reacted]] = result[reacted]
+    cells.changed[rows[reacted], columns[reacted]] = True
@@ -1,49 +1,121 @@
-import pygame
+import numpy as np
+from materials import EMPTY
+from particle import PARTICLE_TYPES, COLOR_VARIANTS, PALETTE
+from chunks import ChunkMap
+from piles import PileIndex
+from renderer import PixelRenderer
+from rng import SimulationRandom
 
 #LIGHT_GREY = (55, 55, 55)
 
 class Grid:
-    def __init__(self, width, height, cell_size):
+    def __init__(self, width, height, cell_size, rng=None):
         self.rows = height // cell_size
         self.columns = width // cell_size
         self.cell_size = cell_size
-        self.cells = [[None for _ in range(self.columns)] for _ in range(self.rows)]
+        # One byte of material id and one byte of color variant per cell
+        # instead of a Python object per cell
+        self.materials = np.zeros((self.rows, self.columns), dtype=np.uint8)
+        self.variants = np.zeros((self.rows, self.columns), dtype=np.uint8)
+        self.palette = PALETTE
+        self.rng = SimulationRandom() if rng is None else rng
+        self.chunks = ChunkMap(self.rows, self.columns)
+        # Settled pile per column, so stable cells can be skipped
+        self.piles = PileIndex(self.rows, self.columns)
+        # The renderer keeps its surfaces between frames, so only the dirty
+        # part of each chunk is redrawn
+        self.renderer = PixelRenderer(self.rows, self.columns, cell_size)
 
     def draw(self, window):
-        for row in range(self.rows):
-            for column in range(self.columns):
-                #color = LIGHT_GREY
-                particle = self.cells[row][column]
-                if particle is not None:
-                    color = particle.color
-                    pygame.draw.rect(window, color, 
-                                 (column * self.cell_size, row * self.cell_size, self.cell_size, self.cell_size))
-                
+        self.renderer.draw(window, self.materials, self.variants, self.palette, self.chunks.pop_dirty())
+
     def add_particle(self, row, column, particle_type):
-        if 0 <= row < self.rows and 0 <= column < self.columns and self.is_cell_empty(row, column):
-            self.cells[row][column] = particle_type()
+        if 0 <= row < self.rows and 0 <= column < self.columns and self.materials[row, column] == EMPTY:
+            self.materials[row, column] = particle_type.material
+            self.variants[row, column] = self.rng.randrange(COLOR_VARIANTS)
+            self.chunks.mark(row, column)
+            self.piles.added(self.materials, row, column)
+
+    def paint(self, top, left, mask, material):
+        # Bulk add_particle, or remove_particle for EMPTY, over the cells of
+        # a mask whose top left corner sits at (top, left). Like the single
+        # cell versions it only fills empty cells and only clears full ones.
+        bottom = top + mask.shape[0]
+        right = left + mask.shape[1]
+        cells = self.materials[top:bottom, left:right]
+        if material == EMPTY:
+            mask = mask & (cells != EMPTY)
+        else:
+            mask = mask & (cells == EMPTY)
+        count = np.count_nonzero(mask)
+        if count == 0:
+            return
+        cells[mask] = material
+        if material != EMPTY:
+            self.variants[top:bottom, left:right][mask] = self.rng.integers(COLOR_VARIANTS, count, np.uint8)
+        self.mark_changed(mask, top, left, wake=True)
+
+    def mark_changed(self, changed, top, left, wake=False):
+        # Bulk bookkeeping for cells changed straight in the planes
+        self.chunks.mark_changed(changed, top, left, wake)
+        self.piles.refresh(self.materials, changed, top, left)
+
+    def mark_all(self):
+        self.chunks.mark_all()
+        self.piles.rebuild(self.materials)
 
     def remove_particle(self, row, column):
         if 0 <= row < self.rows and 0 <= column < self.columns:
-            self.cells[row][column] = None
+            if self.materials[row, column] != EMPTY:
+                self.materials[row, column] = EMPTY
+                self.chunks.mark(row, column)
+                self.piles.removed(row, column)
+
+    def move_particle(self, row, column, new_row, new_column):
+        self.materials[new_row, new_column] = self.materials[row, column]
+        self.variants[new_row, new_column] = self.variants[row, column]
+        self.materials[row, column] = EMPTY
+        self.chunks.mark(row, column)
+        self.chunks.mark(new_row, new_column)
+        self.piles.removed(row, column)
+        self.piles.added(self.materials, new_row, new_column)
 
     def is_cell_empty(self, row, column):
         if 0 <= row < self.rows and 0 <= column < self.columns:
-            if self.cells[row][column] is None:
+            if self.materials[row, column] == EMPTY:
                 return True
         return False
-    
+
+    # get_cell/set_cell keep the old object API working on top of the buffers.
+    # The particle objects are built on demand and are not stored in the grid.
     def set_cell(self, row, column, particle):
         if not(0 <= row < self.rows and 0 <= column < self.columns):
             return
-        self.cells[row][column] = particle
-    
+        self.chunks.mark(row, column)
+        self.piles.removed(row, column)
+        if particle is None:
+            self.materials[row, column] = EMPTY
+            return
+        self.materials[row, column] = particle.material
+        self.variants[row, column] = particle.variant
+        self.piles.added(self.materials, row, column)
+
     def get_cell(self, row, column):
         if 0 <= row < self.rows and 0 <= column < self.columns:
-            return self.cells[row][column]
+            material = self.materials[row, column]
+            if material == EMPTY:
+                return None
+            particle_type = PARTICLE_TYPES[material]
+            particle = particle_type.__new__(particle_type)
+            particle.variant = int(self.variants[row, column])
+            return particle
         return None
 
+    def use_planes(self, materials, variants):
+        self.materials = materials
+        self.variants = variants
+        self.mark_all()
+
     def clear(self):
-        for row in range(self.rows):
-            for column in range(self.columns):
-                self.remove_particle(row, column)
\ No newline at end of file
+        self.materials.fill(EMPTY)
+        self.mark_all()
@@ -0,0 +1,122 @@
+import numpy as np
+from chunks import windows
+from materials import MATERIALS, FLAGS, CONDUCTIVITY, HOT, MELTS, present
+
+AMBIENT = 20.0
+# Share of the difference to the ambient temperature lost per tick
+COOLING = 0.002
+# Chunks where no cell is further than this from the ambient temperature
+# and no heat source sits are left alone
+SETTLED = 0.5
+
+# Temperature layer on top of a Grid.
+#
+# Every tick each cell moves toward the mean of its four neighbors by its
+# material's conductivity, one 5 point stencil over the whole window as
+# array slices. Heat sources are pinned to their temperature, then
+# materials past their melting point change in bulk.
+#
+# Like the grid, the field works in chunks. Only chunks that are warm, hold
+# a heat source, or border such a chunk are updated, in the windows
+# chunks.windows cuts them into. The stencil of a window reads one cell
+# past it, which lies in a chunk no other window covers. New heat sources are only looked for in the chunks that are awake
+# or changed this tick, a source can only appear where something happened,
+# and one that stays put keeps its chunk warm and so in the field. The
+# temperature stays where it is when cells move, it belongs to the place,
+# not to the material.
+
+class HeatField:
+    def __init__(self, grid, ambient=AMBIENT):
+        self.grid = grid
+        self.ambient = ambient
+        rows, columns = grid.rows, grid.columns
+        # One cell of border around the field, refreshed from the edge before
+        # every stencil so heat does not leak out of the world
+        self.padded = np.full((rows + 2, columns + 2), ambient, dtype=np.float32)
+        self.temperature = self.padded[1:-1, 1:-1]
+        chunks = grid.chunks
+        self.active = np.zeros((chunks.chunk_rows, chunks.chunk_columns), dtype=bool)
+
+    def update(self):
+        grid = self.grid
+        chunks = grid.chunks
+        chunk_size = chunks.chunk_size
+        searched = chunks.awake | chunks.touched | self.active
+        active = self.active.copy()
+        for top, left, bottom, right in windows(searched, chunk_size, grid.rows, grid.columns):
+            materials = grid.materials[top:bottom, left:right]
+            found = active[top // chunk_size:-(-bottom // chunk_size), left // chunk_size:-(-right // chunk_size)]
+            for material in present(materials):
+                if FLAGS[material] & HOT:
+                    found |= chunk_any(materials == material, chunk_size)
+        if not active.any():
+            return
+        active = dilate(active)
+
+        self.pad_edges()
+        self.active[:] = False
+        for bounds in windows(active, chunk_size, grid.rows, grid.columns):
+            top, left, bottom, right = bounds
+            materials = grid.materials[top:bottom, left:right]
+            kinds = present(materials)
+            sources = [material for material in kinds if FLAGS[material] & HOT]
+            self.diffuse(materials, bounds)
+            temperature = self.temperature[top:bottom, left:right]
+            for material in sources:
+                temperature[materials == material] = MATERIALS[material].temperature
+            self.melt(materials, temperature, kinds, top, left)
+
+            warm = np.abs(temperature - self.ambient) > SETTLED
+            self.active[top // chunk_size:-(-bottom // chunk_size),
+                        left // chunk_size:-(-right // chunk_size)] = chunk_any(warm, chunk_size)
+
+    def pad_edges(self):
+        padded = self.padded
+        padded[0] = padded[1]
+        padded[-1] = padded[-2]
+        padded[:, 0] = padded[:, 1]
+        padded[:, -1] = padded[:, -2]
+
+    def diffuse(self, materials, bounds):
+        top, left, bottom, right = bounds
+        padded = self.padded
+        center = padded[top + 1:bottom + 1, left + 1:right + 1]
+        change = padded[top:bottom, left + 1:right + 1] + padded[top + 2:bottom + 2, left + 1:right + 1]
+        change += padded[top + 1:bottom + 1, left:right]
+        change += padded[top + 1:bottom + 1, left + 2:right + 2]
+        change -= 4 * center
+        change *= np.take(CONDUCTIVITY, materials, mode="clip")
+        change += (self.ambient - center) * COOLING
+        center += change
+
+    def melt(self, materials, temperature, kinds, top, left):
+        for material in kinds:
+            if not FLAGS[material] & MELTS:
+                continue
+            point, into = MATERIALS[material].melt
+            melting = (materials == material) & (temperature > point)
+            if melting.any():
+                materials[melting] = into
+                self.grid.mark_changed(melting, top, left, wake=True)
+
+    def clear(self):
+        self.temperature.fill(self.ambient)
+        self.active[:] = False
+
+def chunk_any(mask, chunk_size):
+    # Per chunk, whether any cell of a mask starting at a chunk corner is set
+    rows, columns = mask.shape
+    chunk_rows = -(-rows // chunk_size)
+    chunk_columns = -(-columns // chunk_size)
+    padded = np.zeros((chunk_rows * chunk_size, chunk_columns * chunk_size), dtype=bool)
+    padded[:rows, :columns] = mask
+    return padded.reshape(chunk_rows, chunk_size, chunk_columns, chunk_size).any(axis=(1, 3))
+
+def dilate(chunks):
+    padded = np.pad(chunks, 1)
+    rows, columns = chunks.shape
+    grown = np.zeros_like(chunks)
+    for row in range(3):
+        for column in range(3):
+            grown |= padded[row:row + rows, column:column + columns]
+    return grown
@@ -0,0 +1,89 @@
+import time
+
+# Fixed timestep loop: the simulation advances in steps of 1 / tick_rate
+# seconds of wall time, whatever the frame rate.
+#
+# Each frame runs the steps that are due, at most max_steps of them. When it
+# is still behind after that, the frame is not rendered so the next one has
+# more time to catch up. Only after max_skipped_renders frames in a row
+# without rendering is the remaining backlog dropped, so rendering is given up
+# before simulation ticks are. A frame with no step due sleeps until the next
+# one instead of drawing the same picture again.
+
+class FrameStats:
+    __slots__ = ("steps", "dropped_steps", "rendered", "update_time", "render_time")
+
+    def __init__(self):
+        self.steps = 0
+        self.dropped_steps = 0
+        self.rendered = False
+        self.update_time = 0.0
+        self.render_time = 0.0
+
+class FixedStepLoop:
+    def __init__(self, update, render, tick_rate=60, max_steps=5, max_skipped_renders=5,
+                 clock=time.perf_counter, sleep=time.sleep):
+        self.update = update
+        self.render = render
+        self.step_time = 1 / tick_rate
+        self.max_steps = max_steps
+        self.max_skipped_renders = max_skipped_renders
+        self.clock = clock
+        self.sleep = sleep
+        self.backlog = 0.0
+        self.last_time = None
+        self.skipped_renders = 0
+        # Counters of the last frame, and running totals since reset_totals
+        self.frame_stats = FrameStats()
+        self.totals = FrameStats()
+        self.frames = 0
+        self.rendered_frames = 0
+
+    def frame(self):
+        now = self.clock()
+        if self.last_time is None:
+            self.last_time = now - self.step_time
+        self.backlog += now - self.last_time
+        self.last_time = now
+        stats = FrameStats()
+
+        began = self.clock()
+        while self.backlog >= self.step_time and stats.steps < self.max_steps:
+            self.update()
+            self.backlog -= self.step_time
+            stats.steps += 1
+        stats.update_time = self.clock() - began
+
+        behind = self.backlog >= self.step_time
+        if behind and self.skipped_renders < self.max_skipped_renders:
+            self.skipped_renders += 1
+        else:
+            if behind:
+                stats.dropped_steps = int(self.backlog // self.step_time)
+                self.backlog -= stats.dropped_steps * self.step_time
+            if stats.steps or self.skipped_renders:
+                began = self.clock()
+                self.render()
+                stats.render_time = self.clock() - began
+                stats.rendered = True
+            self.skipped_renders = 0
+
+        if not stats.steps and not stats.rendered:
+            self.sleep(max(self.step_time - self.backlog, 0))
+        self.count(stats)
+        return stats
+
+    def count(self, stats):
+        self.frame_stats = stats
+        self.frames += 1
+        self.rendered_frames += stats.rendered
+        totals = self.totals
+        totals.steps += stats.steps
+        totals.dropped_steps += stats.dropped_steps
+        totals.update_time += stats.update_time
+        totals.render_time += stats.render_time
+
+    def reset_totals(self):
+        self.totals = FrameStats()
+        self.frames = 0
+        self.rendered_frames = 0
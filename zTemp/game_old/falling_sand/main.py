@@ -1,5 +1,7 @@
 import pygame
 from simulation import Simulation
+from loop import FixedStepLoop
+from replay import record
 #from grid import Grid
 #from particle import SandParticle
 
@@ -10,13 +12,27 @@ WINDOW_WIDTH = 800
 WINDOW_HEIGHT = 600
 CELL_SIZE = 10
 FPS = 120
+# "fixed" runs the simulation at TICK_RATE steps a second whatever the frame
+# rate, "frame" runs one step per frame capped at FPS
+LOOP = "fixed"
+TICK_RATE = 120
+# Print the loop counters to the window title once a second
+SHOW_STATS = False
+ENGINE = "vectorized"
+WORKERS = 4
+# Seed of the run, a fresh one every run when None
+SEED = None
+# Brush events are recorded here for replay.py when set
+RECORD_PATH = None
 GREY = (29, 29, 29)
 
 window = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
 pygame.display.set_caption("Falling Sand")
 
 clock = pygame.time.Clock()
-simulation = Simulation(WINDOW_WIDTH, WINDOW_HEIGHT, CELL_SIZE)
+simulation = Simulation(WINDOW_WIDTH, WINDOW_HEIGHT, CELL_SIZE, ENGINE, WORKERS, SEED)
+if RECORD_PATH:
+    record(simulation, RECORD_PATH)
 
 #simulation.add_particle(0, 0)
 #simulation.add_particle(1, 1)
@@ -26,26 +42,51 @@ simulation = Simulation(WINDOW_WIDTH, WINDOW_HEIGHT, CELL_SIZE)
 #grid.cells[0][0] = SandParticle()
 #grid.cells[2][1] = SandParticle()
 
-# Simulation Loop
-while True:
+def render():
+    window.fill(GREY)
+    simulation.draw(window)
+    pygame.display.flip()
 
-    # 1. Event Handling
-    simulation.handle_controls()
-    #for event in pygame.event.get():
-        #if event.type == pygame.QUIT:
-            #pygame.quit()
-            #sys.exit()
+def show_stats(loop):
+    totals = loop.totals
+    frames = max(loop.frames, 1)
+    pygame.display.set_caption(
+        f"Falling Sand - {totals.steps} steps, {totals.dropped_steps} dropped, "
+        f"{loop.rendered_frames}/{loop.frames} frames drawn, "
+        f"update {totals.update_time / frames * 1000:.1f} ms, render {totals.render_time / frames * 1000:.1f} ms")
+    loop.reset_totals()
 
-        #if event.type == pygame.KEYDOWN:
+# Fixed timestep loop, or one step per frame
+if LOOP == "fixed":
+    loop = FixedStepLoop(simulation.update, render, TICK_RATE)
+    next_report = pygame.time.get_ticks() + 1000
+    while True:
+        simulation.handle_controls()
+        loop.frame()
+        if SHOW_STATS and pygame.time.get_ticks() >= next_report:
+            show_stats(loop)
+            next_report += 1000
+else:
+    # Simulation Loop
+    while True:
 
-    # 2. Updating State
-    simulation.update()
+        # 1. Event Handling
+        simulation.handle_controls()
+        #for event in pygame.event.get():
+            #if event.type == pygame.QUIT:
+                #pygame.quit()
+                #sys.exit()
 
-    # 3. Drawing
-    window.fill(GREY)
-    simulation.draw(window)
+            #if event.type == pygame.KEYDOWN:
+
+        # 2. Updating State
+        simulation.update()
 
-    #grid.draw(window)
+        # 3. Drawing
+        window.fill(GREY)
+        simulation.draw(window)
+
+        #grid.draw(window)
             
-    pygame.display.flip()
-    clock.tick(FPS)
+        pygame.display.flip()
+        clock.tick(FPS)
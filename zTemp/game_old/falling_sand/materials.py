@@ -0,0 +1,128 @@
+import numpy as np
+
+# Material table for the step engine.
+#
+# density  heavier materials sink through lighter ones, materials lighter
+#          than empty (below zero) float up through it
+# moves    fall: down, slide: down-left/right, flow: left/right,
+#          rise: up, drift: up-left/right
+# static   never moves and nothing can swap with it
+# decay    (chance per tick, material it turns into)
+#
+# Heat, see heat.py:
+# conductivity  share of the difference to its neighbors a cell takes on per
+#               tick, at most 0.25
+# temperature   fixed temperature the material keeps, for heat sources
+# melt          (temperature, material it turns into above it)
+#
+# The table is compiled into lookup arrays below, so the engine dispatches on
+# an array gather per tick whatever the number of materials.
+
+EMPTY = 0
+SAND = 1
+ROCK = 2
+WATER = 3
+SMOKE = 4
+GLASS = 5
+LAVA = 6
+
+class Material:
+    def __init__(self, name, color_range, density=0, moves=(), static=False, decay=None,
+                 conductivity=0.1, temperature=None, melt=None,
+                 spawn_chance=1.0, brush_color=(255, 255, 255)):
+        self.name = name
+        self.color_range = color_range
+        self.density = density
+        self.moves = moves
+        self.static = static
+        self.decay = decay
+        self.conductivity = conductivity
+        self.temperature = temperature
+        self.melt = melt
+        self.spawn_chance = spawn_chance
+        self.brush_color = brush_color
+
+# Indexed by material id
+MATERIALS = [
+    Material("empty", None, conductivity=0.02),
+    Material("sand", ((0.1, 0.12), (0.5, 0.7), (0.7, 0.9)), density=3,
+             moves=("fall", "slide"), melt=(900, GLASS), spawn_chance=0.15, brush_color=(185, 142, 100)),
+    Material("rock", ((0.0, 0.1), (0.1, 0.3), (0.3, 0.5)), static=True, conductivity=0.2,
+             brush_color=(100, 100, 100)),
+    Material("water", ((0.55, 0.6), (0.6, 0.8), (0.7, 0.9)), density=2,
+             moves=("fall", "slide", "flow"), conductivity=0.15, melt=(100, SMOKE), spawn_chance=0.5,
+             brush_color=(60, 120, 220)),
+    Material("smoke", ((0.0, 0.0), (0.0, 0.05), (0.45, 0.6)), density=-1,
+             moves=("rise", "drift", "flow"), decay=(0.01, EMPTY), conductivity=0.02, spawn_chance=0.3,
+             brush_color=(150, 150, 150)),
+    Material("glass", ((0.45, 0.5), (0.1, 0.25), (0.8, 0.95)), static=True, brush_color=(190, 225, 230)),
+    Material("lava", ((0.0, 0.06), (0.85, 1.0), (0.8, 1.0)), density=5,
+             moves=("fall", "slide", "flow"), conductivity=0.2, temperature=1200, spawn_chance=0.5,
+             brush_color=(230, 80, 20)),
+]
+
+# (material, neighbor, turns into, chance per tick while touching)
+REACTIONS = [
+    ("smoke", "water", "empty", 0.2),
+    ("lava", "water", "rock", 0.3),
+    ("water", "lava", "smoke", 0.5),
+]
+
+MATERIAL_IDS = {material.name: index for index, material in enumerate(MATERIALS)}
+
+FALL = 1
+SLIDE = 2
+FLOW = 4
+RISE = 8
+DRIFT = 16
+STATIC = 32
+DECAYS = 64
+REACTS = 128
+HOT = 256
+MELTS = 512
+MOVING = FALL | SLIDE | FLOW | RISE | DRIFT
+MOVE_BITS = {"fall": FALL, "slide": SLIDE, "flow": FLOW, "rise": RISE, "drift": DRIFT}
+
+def compile_table():
+    count = len(MATERIALS)
+    if count > 32:
+        # The engine keeps the materials present in a grid as a 32 bit set
+        raise ValueError("at most 32 materials are supported")
+    flags = np.zeros(count, dtype=np.uint16)
+    density = np.zeros(count, dtype=np.int8)
+    decay_chance = np.zeros(count, dtype=np.float32)
+    decay_into = np.arange(count, dtype=np.uint8)
+    react_chance = np.zeros((count, count), dtype=np.float32)
+    react_into = np.repeat(np.arange(count, dtype=np.uint8)[:, None], count, axis=1)
+
+    for index, material in enumerate(MATERIALS):
+        density[index] = material.density
+        for move in material.moves:
+            flags[index] |= MOVE_BITS[move]
+        if material.static:
+            flags[index] |= STATIC
+        if material.temperature is not None:
+            flags[index] |= HOT
+        if material.melt is not None:
+            flags[index] |= MELTS
+        if material.decay is not None:
+            flags[index] |= DECAYS
+            decay_chance[index], decay_into[index] = material.decay
+    for name, neighbor, into, chance in REACTIONS:
+        index = MATERIAL_IDS[name]
+        flags[index] |= REACTS
+        react_chance[index, MATERIAL_IDS[neighbor]] = chance
+        react_into[index, MATERIAL_IDS[neighbor]] = MATERIAL_IDS[into]
+    return flags, density, decay_chance, decay_into, react_chance, react_into
+
+FLAGS, DENSITY, DECAY_CHANCE, DECAY_INTO, REACT_CHANCE, REACT_INTO = compile_table()
+# Static materials and powders, which only fall and slide, build piles that
+# stay put once settled, see piles.py
+PILE = (FLAGS & STATIC != 0) | ((FLAGS & MOVING != 0) & (FLAGS & (MOVING & ~(FALL | SLIDE)) == 0))
+CONDUCTIVITY = np.array([material.conductivity for material in MATERIALS], dtype=np.float32)
+SPAWN_CHANCE = [material.spawn_chance for material in MATERIALS]
+
+def present(materials):
+    # Ids of the materials found in a plane, from one pass over it
+    kinds = int(np.bitwise_or.reduce(np.left_shift(np.uint32(1), materials), axis=None))
+    return [material for material in range(len(MATERIALS)) if kinds >> material & 1]
@@ -0,0 +1,152 @@
+import atexit
+import multiprocessing
+import time
+import numpy as np
+from multiprocessing import shared_memory
+from engine import step
+from materials import EMPTY, SAND
+
+# Steps the grid in horizontal strips on worker processes that share the
+# material, variant and changed planes.
+#
+# Each strip is stepped together with the first row of the strip below it,
+# its halo row, so grains fall and slide across the edge and smoke rises
+# across it. A strip only reads
+# and writes its own rows and its halo row, so even numbered strips can all
+# be stepped at once, then odd numbered ones. The second phase sees the
+# changed mask of the first, so a grain that crossed an edge does not move
+# twice. The strips are fixed and handed out to the workers round robin, so
+# the result depends on neither timing nor the worker count.
+
+STRIPS = 16
+# A strip and its halo row must not reach the next strip of the same phase,
+# which takes strips of at least two rows
+MIN_STRIP_ROWS = 2
+
+def context():
+    # Fork keeps the game scripts, which have no __main__ guard, from being
+    # run again in every worker
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context("spawn")
+
+class ParallelStepper:
+    def __init__(self, grid, workers, strips=STRIPS, seed=0):
+        count = min(max(strips, 2 * workers), grid.rows // MIN_STRIP_ROWS)
+        if count < 2:
+            raise ValueError(f"A grid of {grid.rows} rows is too small to step in parallel")
+        self.grid = grid
+        # More workers than strips of one phase would have nothing to do
+        workers = min(workers, -(-count // 2))
+        self.workers = workers
+        shape = (grid.rows, grid.columns)
+        self.memory = [shared_memory.SharedMemory(create=True, size=max(grid.rows * grid.columns, 1))
+                       for _ in range(3)]
+        materials, variants, changed = [np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+                                        for memory, dtype in zip(self.memory, (np.uint8, np.uint8, bool))]
+        materials[:] = grid.materials
+        variants[:] = grid.variants
+        # The grid works on the shared planes from now on
+        grid.materials = materials
+        grid.variants = variants
+        self.changed = changed
+
+        self.strips = split_rows(grid.rows, count)
+        names = [memory.name for memory in self.memory]
+        self.connections = []
+        self.processes = []
+        ctx = context()
+        for worker in range(workers):
+            parent, child = ctx.Pipe()
+            process = ctx.Process(target=work, args=(child, names, shape, self.strips, seed), daemon=True)
+            process.start()
+            self.connections.append(parent)
+            self.processes.append(process)
+        atexit.register(self.close)
+
+    def step(self, tick):
+        self.changed.fill(False)
+        active = self.active_strips()
+        for phase in (0, 1):
+            strips = [index for index in range(phase, len(self.strips), 2) if active[index]]
+            for worker, connection in enumerate(self.connections):
+                connection.send((tick, strips[worker::self.workers]))
+            for connection in self.connections:
+                connection.recv()
+        self.grid.mark_changed(self.changed, 0, 0)
+
+    def active_strips(self):
+        # A strip is skipped when no awake chunk overlaps it or its halo row
+        chunks = self.grid.chunks
+        awake_rows = np.repeat(chunks.awake.any(axis=1), chunks.chunk_size)[:self.grid.rows]
+        return [bool(awake_rows[start:min(stop + 1, self.grid.rows)].any()) for start, stop in self.strips]
+
+    def close(self):
+        if not self.connections:
+            return
+        for connection in self.connections:
+            connection.send(None)
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+        # Hand the grid private copies before the shared planes go away
+        self.grid.materials = self.grid.materials.copy()
+        self.grid.variants = self.grid.variants.copy()
+        self.changed = None
+        for memory in self.memory:
+            memory.close()
+            memory.unlink()
+
+def split_rows(rows, count):
+    bounds = np.linspace(0, rows, count + 1).astype(int)
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+def work(connection, names, shape, strips, seed):
+    memory = [shared_memory.SharedMemory(name=name) for name in names]
+    materials, variants, changed = [np.ndarray(shape, dtype=dtype, buffer=block.buf)
+                                    for block, dtype in zip(memory, (np.uint8, np.uint8, bool))]
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        tick, indices = message
+        for index in indices:
+            start, stop = strips[index]
+            if stop > start:
+                window = slice(start, min(stop + 1, shape[0]))
+                # Seeded by the run's seed, tick and strip so decay and
+                # reactions do not depend on which worker steps the strip
+                rng = np.random.default_rng((seed, tick, start))
+                step(materials[window], variants[window], tick + start, changed[window], rng,
+                     open_top=start > 0, open_bottom=stop < shape[0])
+        connection.send(True)
+    del materials, variants, changed
+    for block in memory:
+        block.close()
+
+def scaling_report(rows=2000, columns=2000, ticks=50, worker_counts=(1, 2, 4, 8)):
+    # Cells per second while a grid a third full of sand rains down
+    from grid import Grid
+    rng = np.random.default_rng(0)
+    start = np.where(rng.random((rows, columns)) < 0.3, SAND, EMPTY).astype(np.uint8)
+    print(f"{rows}x{columns} grid, {ticks} ticks, {multiprocessing.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'cells/s':>14} {'speedup':>8}")
+    baseline = None
+    for workers in worker_counts:
+        grid = Grid(columns, rows, 1)
+        grid.materials[:] = start
+        stepper = ParallelStepper(grid, workers)
+        stepper.step(0)
+        began = time.perf_counter()
+        for tick in range(1, ticks + 1):
+            grid.chunks.end_tick()
+            stepper.step(tick)
+        elapsed = time.perf_counter() - began
+        stepper.close()
+        rate = rows * columns * ticks / elapsed
+        baseline = baseline or rate
+        print(f"{workers:>8} {rate:>14,.0f} {rate / baseline:>7.2f}x")
+
+if __name__ == "__main__":
+    scaling_report()
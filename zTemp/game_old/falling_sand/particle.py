@@ -1,31 +1,94 @@
 import random
 import colorsys
+import numpy as np
+from materials import EMPTY, SAND, ROCK, WATER, SMOKE, GLASS, LAVA, MATERIALS
+
+# Every material gets a fixed set of color variants generated once at
+# import, a particle only keeps the index of its variant
+COLOR_VARIANTS = 16
+PALETTE_SEED = 1
+
+# How each material moves is described in materials.py, the particle classes
+# only give the old object API a type per material
+
+class Particle:
+    __slots__ = ("variant",)
+    material = EMPTY
 
-class SandParticle:
     def __init__(self):
-        self.color = random_color((0.1, 0.12), (0.5, 0.7), (0.7, 0.9))
+        self.variant = random.randrange(COLOR_VARIANTS)
+
+    @property
+    def color(self):
+        return COLORS[self.material][self.variant]
 
-    def update(self, grid, row, column):
+class SandParticle(Particle):
+    __slots__ = ()
+    material = SAND
+
+    # Sand rule of the classic engine, the reference for the table driven one
+    @staticmethod
+    def update(grid, row, column):
         if grid.is_cell_empty(row + 1, column):
             return row + 1, column
         else:
-            offsets = [-1, 1]
-            random.shuffle(offsets)
-            for offset in offsets:
-                new_column = column + offset
-                if grid.is_cell_empty(row + 1, new_column):
-                    return row + 1, new_column
+            left = grid.is_cell_empty(row + 1, column - 1)
+            right = grid.is_cell_empty(row + 1, column + 1)
+            # One batched random bit picks the side when both are open. A grain
+            # with nowhere to go draws nothing, so skipping resting grains
+            # leaves the bits of every other grain as they were.
+            if left and right:
+                return row + 1, column - 1 if grid.rng.bit() else column + 1
+            if left:
+                return row + 1, column - 1
+            if right:
+                return row + 1, column + 1
                 
         return row, column
             #return row, column
     
-class RockParticle:
-    def __init__(self):
-        self.color = random_color((0.0, 0.1), (0.1, 0.3), (0.3, 0.5))
+class RockParticle(Particle):
+    __slots__ = ()
+    material = ROCK
+
+class WaterParticle(Particle):
+    __slots__ = ()
+    material = WATER
 
-def random_color(hue_range, saturation_range, value_range):
-    hue = random.uniform(* hue_range)
-    saturation = random.uniform(* saturation_range)
-    value = random.uniform(* value_range)
+class SmokeParticle(Particle):
+    __slots__ = ()
+    material = SMOKE
+
+class GlassParticle(Particle):
+    __slots__ = ()
+    material = GLASS
+
+class LavaParticle(Particle):
+    __slots__ = ()
+    material = LAVA
+
+# Indexed by material id, EMPTY has no particle class
+PARTICLE_TYPES = [None, SandParticle, RockParticle, WaterParticle, SmokeParticle, GlassParticle, LavaParticle]
+
+def random_color(hue_range, saturation_range, value_range, rng=random):
+    hue = rng.uniform(* hue_range)
+    saturation = rng.uniform(* saturation_range)
+    value = rng.uniform(* value_range)
     r, g, b = colorsys.hsv_to_rgb(hue, saturation, value)
-    return int(r * 255), int(g * 255), int(b * 255)
\ No newline at end of file
+    return int(r * 255), int(g * 255), int(b * 255)
+
+def build_palette():
+    # A fixed seed keeps the colors the same from run to run
+    rng = random.Random(PALETTE_SEED)
+    palette = np.zeros((len(MATERIALS), COLOR_VARIANTS, 3), dtype=np.uint8)
+    for index, material in enumerate(MATERIALS):
+        if material.color_range is None:
+            continue
+        for variant in range(COLOR_VARIANTS):
+            palette[index, variant] = random_color(*material.color_range, rng)
+    return palette
+
+# (material, variant) -> RGB, as an array for renderers and as tuples for
+# particle objects
+PALETTE = build_palette()
+COLORS = [[tuple(color) for color in colors] for colors in PALETTE.tolist()]
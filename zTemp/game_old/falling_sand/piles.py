@@ -0,0 +1,80 @@
+import numpy as np
+from materials import FLAGS, DENSITY, PILE, FALL
+
+# Index of the settled pile at the bottom of every column.
+#
+# top[column] is the first row of the unbroken run of pile cells, static
+# materials and powders that only fall and slide, that stands on the floor.
+# A pile cell at (row, column) can not move when the cell below it and both
+# cells diagonally below are pile cells that can not move either. Going up
+# from the floor that holds for every row from
+#
+#   stable_from[column] = max(top[column], stable_from[column - 1] - 1, stable_from[column + 1] - 1)
+#
+# down, which unrolls to the largest top[other] - |column - other| over all
+# columns. A pile cell only resting on the pile next to it is not enough,
+# that pile could slide away in the same tick. The resting bit of a cell is
+# a comparison with its column's entry, so the index is one integer per
+# column and is kept up to date as cells are added, removed and moved.
+# Cells may be missing from the index, never wrongly in it.
+
+class PileIndex:
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.columns = columns
+        self.top = np.full(columns, rows, dtype=np.int32)
+
+    def rebuild(self, materials, columns=None):
+        # Recomputes the given columns, all of them by default
+        if columns is None:
+            columns = slice(None)
+        filled = np.take(PILE, materials[:, columns], mode="clip")
+        gap = ~filled[::-1]
+        run = np.where(gap.any(axis=0), gap.argmax(axis=0), self.rows)
+        self.top[columns] = self.rows - run
+
+    def added(self, materials, row, column):
+        # A pile cell right on top of the run extends it, along with any
+        # pile cells stacked on it
+        if row != self.top[column] - 1 or not PILE[materials[row, column]]:
+            return
+        while row > 0 and PILE[materials[row - 1, column]]:
+            row -= 1
+        self.top[column] = row
+
+    def removed(self, row, column):
+        if row >= self.top[column]:
+            self.top[column] = row + 1
+
+    def refresh(self, materials, changed, top, left):
+        # Bulk update from a mask of changed cells whose top left corner sits
+        # at (top, left). Only columns changed at or right above their run
+        # can have a different run.
+        touched = np.flatnonzero(changed.any(axis=0))
+        if len(touched) == 0:
+            return
+        lowest = top + changed.shape[0] - 1 - changed[::-1, touched].argmax(axis=0)
+        columns = left + touched
+        columns = columns[lowest >= self.top[columns] - 1]
+        if len(columns):
+            self.rebuild(materials, columns)
+
+    def stable_from(self, left=0, right=None):
+        # First resting row per column of [left, right). Past the grid edge
+        # counts as a wall.
+        right = self.columns if right is None else right
+        # Largest top[other] - |column - other|, from the columns on the left
+        # and from those on the right, each as one running maximum
+        columns = np.arange(self.columns, dtype=np.int32)
+        from_left = np.maximum.accumulate(self.top + columns) - columns
+        from_right = (np.maximum.accumulate((self.top - columns)[::-1])[::-1]) + columns
+        return np.maximum(from_left, from_right)[left:right]
+
+def can_skip_piles(kinds):
+    # A material heavier than a pile material falls through it, which the
+    # index does not see coming. kinds are the materials present.
+    piled = [DENSITY[material] for material in kinds if PILE[material] and FLAGS[material] & FALL]
+    if not piled:
+        return True
+    lightest = min(piled)
+    return not any(FLAGS[material] & FALL and DENSITY[material] > lightest for material in kinds)
@@ -0,0 +1,67 @@
+import pygame
+import numpy as np
+
+# Empty cells map to the color key and let the window background through
+COLOR_KEY = (0, 0, 0)
+# Past this many dirty rectangles a single bounding one is cheaper
+MAX_RECTS = 64
+
+class PixelRenderer:
+    def __init__(self, rows, columns, cell_size):
+        self.rows = rows
+        self.columns = columns
+        self.cell_size = cell_size
+        # One pixel per cell, colors are written straight into its pixels
+        # and the whole surface is scaled up by cell_size in one go
+        self.surface = pygame.Surface((columns, rows))
+        self.surface.set_colorkey(COLOR_KEY)
+        if cell_size == 1:
+            self.scaled = self.surface
+        else:
+            self.scaled = pygame.Surface((columns * cell_size, rows * cell_size))
+            self.scaled.set_colorkey(COLOR_KEY)
+        # Palette entry for every cell, reused every frame
+        self.index = np.zeros((rows, columns), dtype=np.uint16)
+        # The palette mapped to the surface pixel format, rebuilt only when
+        # a different palette is passed in
+        self.palette = None
+        self.mapped = None
+
+    def draw(self, window, materials, variants, palette, rects=None):
+        # rects are (top, left, bottom, right) cell rectangles to refresh,
+        # None refreshes the whole grid
+        if rects is None:
+            rects = [(0, 0, self.rows, self.columns)]
+        elif len(rects) > MAX_RECTS:
+            rects = [(min(rect[0] for rect in rects), min(rect[1] for rect in rects),
+                      max(rect[2] for rect in rects), max(rect[3] for rect in rects))]
+        if rects:
+            self.write(materials, variants, palette, rects)
+            if self.scaled is not self.surface:
+                self.scale(rects)
+        window.blit(self.scaled, (0, 0))
+
+    def write(self, materials, variants, palette, rects):
+        # pixels2d is indexed [x, y], its transpose lines up with the planes
+        pixels = pygame.surfarray.pixels2d(self.surface).T
+        if palette is not self.palette:
+            self.palette = palette
+            mapped = pygame.surfarray.map_array(self.surface, palette)
+            self.mapped = mapped.reshape(-1).astype(pixels.dtype)
+        variant_count = palette.shape[1]
+        for top, left, bottom, right in rects:
+            index = self.index[top:bottom, left:right]
+            np.multiply(materials[top:bottom, left:right], variant_count, out=index, dtype=np.uint16)
+            np.add(index, variants[top:bottom, left:right], out=index)
+            np.take(self.mapped, index, out=pixels[top:bottom, left:right], mode="clip")
+        # Surfaces stay locked while a pixel view is alive
+        del pixels
+
+    def scale(self, rects):
+        size = self.cell_size
+        for top, left, bottom, right in rects:
+            width = right - left
+            height = bottom - top
+            source = self.surface.subsurface((left, top, width, height))
+            target = self.scaled.subsurface((left * size, top * size, width * size, height * size))
+            pygame.transform.scale(source, (width * size, height * size), target)
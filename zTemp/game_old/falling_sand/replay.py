@@ -0,0 +1,139 @@
+import os
+import argparse
+import hashlib
+import json
+import sys
+import time
+from simulation import Simulation
+
+# Recording and headless replay of a falling sand run.
+#
+# A run is given by its seed and the brush events, so that is all a recording
+# keeps:
+#
+#   {"version": 1, "seed": ..., "engine": "vectorized", "rows": ..., "columns": ...,
+#    "cell_size": ..., "ticks": ..., "digest": ...,
+#    "events": [[tick, "stroke", mode, radius, start row, start column, end row, end column],
+#               [tick, "restart"], ...]}
+#
+# An event is applied right before the update of its tick, like input handled
+# in the frame before. digest is a hash of the planes at the end of the run,
+# so a replay can tell whether it came out the same.
+#
+#   python replay.py run.replay
+#   python replay.py run.replay --engine classic --ticks 500
+#
+# Replaying with another engine gives a different run, that is only meant for
+# comparing their speed on the same input.
+
+VERSION = 1
+
+class Recorder:
+    def __init__(self, simulation, path):
+        if simulation.ticks:
+            raise ValueError("A recording has to start with the run")
+        grid = simulation.grid
+        self.path = path
+        self.recording = {
+            "version": VERSION,
+            "seed": simulation.random.seed,
+            "engine": simulation.engine,
+            "rows": grid.rows,
+            "columns": grid.columns,
+            "cell_size": grid.cell_size,
+            "events": [],
+        }
+
+    def stroke(self, tick, mode, radius, start, end):
+        self.recording["events"].append([tick, "stroke", mode, radius, *start, *end])
+
+    def restart(self, tick):
+        self.recording["events"].append([tick, "restart"])
+
+    def save(self, simulation):
+        self.recording["ticks"] = simulation.ticks
+        self.recording["digest"] = digest(simulation.grid)
+        with open(self.path, "w") as file:
+            json.dump(self.recording, file)
+
+def record(simulation, path):
+    simulation.recorder = Recorder(simulation, path)
+
+def load(path):
+    with open(path) as file:
+        recording = json.load(file)
+    if recording.get("version") != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} recording")
+    return recording
+
+def digest(grid):
+    return hashlib.sha1(grid.materials.tobytes() + grid.variants.tobytes()).hexdigest()
+
+class Replayer:
+    def __init__(self, recording, engine=None, workers=4):
+        cell_size = recording["cell_size"]
+        self.recording = recording
+        self.simulation = Simulation(recording["columns"] * cell_size, recording["rows"] * cell_size, cell_size,
+                                     engine or recording["engine"], workers, recording["seed"])
+        self.events = recording["events"]
+        self.next_event = 0
+
+    def apply_events(self):
+        # Events up to the current tick, the ones right before its update
+        simulation = self.simulation
+        while self.next_event < len(self.events) and self.events[self.next_event][0] <= simulation.ticks:
+            apply_event(simulation, self.events[self.next_event])
+            self.next_event += 1
+
+    def step(self):
+        self.apply_events()
+        self.simulation.update()
+
+    def run(self, ticks=None):
+        ticks = self.recording["ticks"] if ticks is None else ticks
+        while self.simulation.ticks < ticks:
+            self.step()
+        # Input that came after the last update is part of the end state too
+        self.apply_events()
+        return self.simulation
+
+def apply_event(simulation, event):
+    kind = event[1]
+    if kind == "stroke":
+        _, _, mode, radius, start_row, start_column, end_row, end_column = event
+        simulation.mode = mode
+        simulation.brush.radius = radius
+        simulation.paint_stroke((start_row, start_column), (end_row, end_column))
+    elif kind == "restart":
+        simulation.restart()
+    else:
+        raise ValueError(f"Unknown event {kind!r}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded falling sand run headless")
+    parser.add_argument("path")
+    parser.add_argument("--engine", choices=["classic", "vectorized", "parallel"],
+                        help="engine to replay with, the recorded one by default")
+    parser.add_argument("--ticks", type=int, help="ticks to replay, the recorded count by default")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    recording = load(args.path)
+    replayer = Replayer(recording, args.engine, args.workers)
+    began = time.perf_counter()
+    simulation = replayer.run(args.ticks)
+    elapsed = time.perf_counter() - began
+    simulation.close()
+
+    result = digest(simulation.grid)
+    print(f"{simulation.ticks} ticks, {elapsed / max(simulation.ticks, 1) * 1000:.2f} ms per tick")
+    print(f"digest {result}")
+    if simulation.ticks == recording["ticks"] and simulation.engine == recording["engine"]:
+        if result != recording["digest"]:
+            print("The replay does not match the recording", file=sys.stderr)
+            sys.exit(1)
+        print("Matches the recording")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import numpy as np
+
+# Seeded random source of one simulation.
+#
+# Everything random in a run, the slide side of classic grains, spawn rolls,
+# color variants, decay and reactions, comes from one generator seeded here,
+# so a run is fully given by its seed and its input. The per-cell draws of the
+# classic engine are handed out from batches drawn a few thousand at a time
+# instead of one generator call per grain.
+
+BATCH = 4096
+
+def new_seed():
+    return int(np.random.SeedSequence().generate_state(1)[0])
+
+class SimulationRandom:
+    def __init__(self, seed=None, batch=BATCH):
+        self.seed = new_seed() if seed is None else seed
+        self.generator = np.random.default_rng(self.seed)
+        self.batch = batch
+        self.bits = []
+        self.floats = []
+        # stop -> batch of integers in [0, stop)
+        self.ranges = {}
+
+    def bit(self):
+        if not self.bits:
+            self.bits = self.generator.integers(0, 2, self.batch, dtype=np.uint8).tolist()
+        return self.bits.pop()
+
+    def random(self):
+        if not self.floats:
+            self.floats = self.generator.random(self.batch).tolist()
+        return self.floats.pop()
+
+    def randrange(self, stop):
+        batch = self.ranges.get(stop)
+        if not batch:
+            batch = self.ranges[stop] = self.generator.integers(0, stop, self.batch).tolist()
+        return batch.pop()
+
+    def random_array(self, shape):
+        return self.generator.random(shape)
+
+    def integers(self, stop, size, dtype=np.int64):
+        return self.generator.integers(0, stop, size, dtype=dtype)
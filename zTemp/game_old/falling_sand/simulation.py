@@ -1,55 +1,150 @@
-import pygame, sys, random
+import pygame, sys, os
+import numpy as np
 from grid import Grid
 from particle import SandParticle
-from particle import RockParticle
+from particle import PARTICLE_TYPES
+from materials import EMPTY, SAND, MATERIALS, MATERIAL_IDS, SPAWN_CHANCE, present
+from brush import Brush, stroke_footprint
+from heat import HeatField
+from piles import can_skip_piles
+from rng import SimulationRandom
+from engine import step
+from parallel import ParallelStepper
+import snapshot
+
+SNAPSHOT_PATH = "world.sand"
 
 class Simulation:
-    def __init__(self, width, height, cell_size):
-        self.grid = Grid(width, height, cell_size)
+    def __init__(self, width, height, cell_size, engine="vectorized", workers=4, seed=None):
+        # Every random draw of the run comes from here, so the seed and the
+        # input are all a replay needs
+        self.random = SimulationRandom(seed)
+        self.grid = Grid(width, height, cell_size, self.random)
         self.cell_size = cell_size
         self.mode = "sand"
-        self.brush_size = 2
+        self.brush = Brush()
+        self.engine = engine
+        self.ticks = 0
+        # Leave out the rows under the settled piles
+        self.skip_piles = True
+        self.stepper = None
+        if engine == "parallel":
+            self.stepper = ParallelStepper(self.grid, workers, seed=self.random.seed)
+        self.heat = HeatField(self.grid)
+        # Called after every step, before the chunks settle, so layers on top
+        # of the grid can change it in bulk
+        self.hooks = [self.heat.update]
+        # Logs brush events for replay.py while set
+        self.recorder = None
     
     def draw(self, window):
         self.grid.draw(window)
         self.draw_brush(window)
 
     def add_particle(self, row, column):
-        if self.mode == "sand":
-            if random.random() < 0.15:
-                self.grid.add_particle(row, column, SandParticle)
-            #particle = SandParticle
-        elif self.mode == "rock":
-            self.grid.add_particle(row, column, RockParticle)
-            #particle = RockParticle
-            
-        #self.grid.add_particle(row, column, particle)
-        #self.grid.add_particle(row, column, SandParticle)
+        material = MATERIAL_IDS.get(self.mode)
+        if material is not None and self.random.random() < SPAWN_CHANCE[material]:
+            self.grid.add_particle(row, column, PARTICLE_TYPES[material])
 
     def remove_particle(self, row, column):
         self.grid.remove_particle(row, column)
 
     def update(self):
-        for row in range(self.grid.rows -2, -1, -1):
-            if row % 2 == 0:
-                column_range = range(self.grid.columns)
-            else:
-                column_range = reversed(range(self.grid.columns))
+        if self.engine == "vectorized":
+            self.update_vectorized()
+        elif self.engine == "parallel":
+            self.stepper.step(self.ticks)
+        else:
+            self.update_classic()
+        for hook in self.hooks:
+            hook()
+        self.grid.chunks.end_tick()
+        self.ticks += 1
+
+    def update_vectorized(self):
+        # Step each window of awake chunks on its own
+        for top, left, bottom, right in self.grid.chunks.awake_windows():
+            if self.skip_piles:
+                # Nothing moves in or out of the rows where every column rests
+                settled = max(int(self.grid.piles.stable_from(left, right).max()), top)
+                if settled < bottom and can_skip_piles(present(self.grid.materials[top:bottom, left:right])):
+                    bottom = settled
+            changed = step(self.grid.materials[top:bottom, left:right],
+                           self.grid.variants[top:bottom, left:right], self.ticks + top, rng=self.random.generator)
+            self.grid.mark_changed(changed, top, left)
+
+    def update_classic(self):
+        # Reference loop, it only moves sand. Every other material stays
+        # where it is painted, it is only moved by the table driven engines.
+        materials = self.grid.materials
+        chunk_size = self.grid.chunks.chunk_size
+        awake_columns = self.grid.chunks.awake_columns()
+        # Cells resting on a settled pile stay put all tick, the grains that
+        # move only ever land on top of them
+        stable_from = np.full(self.grid.columns, self.grid.rows)
+        if self.skip_piles:
+            stable_from = self.grid.piles.stable_from()
+        for row in range(min(self.grid.rows - 2, int(stable_from.max()) - 1), -1, -1):
+            # Grains only ever move down a row, so the sand columns of this
+            # row can be collected up front and empty cells are never visited.
+            # Columns in sleeping chunks are skipped as well.
+            sand = (materials[row] == SAND) & awake_columns[row // chunk_size] & (row < stable_from)
+            columns = np.flatnonzero(sand).tolist()
+            if row % 2 == 1:
+                columns.reverse()
             
-            for column in column_range:
-                particle = self.grid.get_cell(row, column)
-                if isinstance(particle, SandParticle):
-                    new_pos = particle.update(self.grid, row, column)
-                    if new_pos != (row, column):
-                        self.grid.set_cell(new_pos[0], new_pos[1], particle)
-                        self.grid.remove_particle(row, column)
+            for column in columns:
+                new_pos = SandParticle.update(self.grid, row, column)
+                if new_pos != (row, column):
+                    self.grid.move_particle(row, column, new_pos[0], new_pos[1])
 
     def restart(self):
+        if self.recorder is not None:
+            self.recorder.restart(self.ticks)
         self.grid.clear()
+        self.heat.clear()
+
+    def save_snapshot(self, path=SNAPSHOT_PATH):
+        snapshot.save(self.grid, path, compress=True)
+
+    def load_snapshot(self, path=SNAPSHOT_PATH):
+        try:
+            materials, variants, _ = snapshot.load(path)
+        except snapshot.SnapshotError as error:
+            print(error)
+            return
+        if materials.shape != self.grid.materials.shape:
+            print("Snapshot does not fit this grid")
+            return
+        if self.recorder is not None:
+            # The snapshot is not part of the recording, the replay would
+            # go its own way from here
+            print("Recording stopped")
+            self.stop_recording()
+        if self.stepper is not None:
+            # The workers keep using the shared planes
+            self.grid.materials[:] = materials
+            self.grid.variants[:] = variants
+            self.grid.mark_all()
+        else:
+            self.grid.use_planes(materials, variants)
+        # The temperatures were those of the old grid
+        self.heat.clear()
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.save(self)
+            self.recorder = None
+
+    def close(self):
+        self.stop_recording()
+        if self.stepper is not None:
+            self.stepper.close()
 
     def handle_controls(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                self.stop_recording()
                 pygame.quit()
                 sys.exit()
             if event.type == pygame.KEYDOWN:
@@ -66,9 +161,32 @@ class Simulation:
         elif event.key == pygame.K_r:
             print("Rock Mode")
             self.mode = "rock"
+        elif event.key == pygame.K_w:
+            print("Water Mode")
+            self.mode = "water"
+        elif event.key == pygame.K_m:
+            print("Smoke Mode")
+            self.mode = "smoke"
+        elif event.key == pygame.K_g:
+            print("Glass Mode")
+            self.mode = "glass"
+        elif event.key == pygame.K_l:
+            print("Lava Mode")
+            self.mode = "lava"
         elif event.key == pygame.K_e:
             print("Eraser Mode")
             self.mode = "erase"
+        elif event.key == pygame.K_LEFTBRACKET:
+            self.brush.resize(-1)
+        elif event.key == pygame.K_RIGHTBRACKET:
+            self.brush.resize(1)
+        elif event.key == pygame.K_F5:
+            print("Saved " + SNAPSHOT_PATH)
+            self.save_snapshot()
+        elif event.key == pygame.K_F9:
+            if os.path.exists(SNAPSHOT_PATH):
+                print("Loaded " + SNAPSHOT_PATH)
+                self.load_snapshot()
 
     def handle_mouse(self):
         buttons = pygame.mouse.get_pressed()
@@ -77,38 +195,47 @@ class Simulation:
             row = pos[1] // self.cell_size
             column = pos[0] // self.cell_size
 
-            self.apply_brush(row, column)
-            #self.add_particle(row, column)
-
-            #if self.mode == "erase":
-                #self.grid.remove_particle(row, column)
-            #else:
-                #self.add_particle(row, column)
-
-    def apply_brush(self, row, column):
-        for r in range(self.brush_size):
-            for c in range(self.brush_size):
-                current_row = row + r
-                current_col = column + c
-
-                if self.mode == "erase":
-                    self.grid.remove_particle(current_row, current_col)
-                else:
-                    self.add_particle(current_row, current_col)
+            # The stroke joins up with where the mouse was last frame
+            self.paint_stroke(*self.brush.segment(row, column))
+        else:
+            self.brush.release()
+
+    def apply_brush(self, row, column, start=None):
+        # Paints a stroke from start, or just a dab when there is none
+        self.paint_stroke(start or (row, column), (row, column))
+
+    def paint_stroke(self, start, end):
+        if self.recorder is not None:
+            self.recorder.stroke(self.ticks, self.mode, self.brush.radius, start, end)
+        self.paint(stroke_footprint(start, end, self.brush.radius, self.grid.rows, self.grid.columns))
+
+    def paint(self, footprint):
+        if footprint is None:
+            return
+        top, left, mask = footprint
+        if self.mode == "erase":
+            self.grid.paint(top, left, mask, EMPTY)
+            return
+        material = MATERIAL_IDS.get(self.mode)
+        if material is None:
+            return
+        chance = SPAWN_CHANCE[material]
+        if chance < 1:
+            mask = mask & (self.random.random_array(mask.shape) < chance)
+        self.grid.paint(top, left, mask, material)
 
     def draw_brush(self, window):
         mouse_pos = pygame.mouse.get_pos()
         column = mouse_pos[0] // self.cell_size
         row = mouse_pos[1] // self.cell_size
 
-        brush_visual_size = self.brush_size * self.cell_size
+        center = (column * self.cell_size + self.cell_size // 2, row * self.cell_size + self.cell_size // 2)
+        brush_visual_radius = int((self.brush.radius + 0.5) * self.cell_size)
         color = (255, 255, 255)
 
-        if self.mode == "rock":
-            color = (100, 100, 100)
-        elif self.mode == "sand":
-            color = (185, 142, 100)
+        if self.mode in MATERIAL_IDS:
+            color = MATERIALS[MATERIAL_IDS[self.mode]].brush_color
         elif self.mode == "erase":
             color = (255, 105, 180)
 
-        pygame.draw.rect(window, color, (column * self.cell_size, row *self.cell_size, brush_visual_size, brush_visual_size))
\ No newline at end of file
+        pygame.draw.circle(window, color, center, brush_visual_radius, 2)
@@ -0,0 +1,106 @@
+import os
+import struct
+import numpy as np
+from materials import EMPTY, MATERIALS
+
+# Binary snapshot of a sand world.
+#
+#   header, padded to 64 bytes:
+#     magic b"SAND", version, flags, rows, columns, cell_size,
+#     material run count, variant run count
+#   raw:        material plane, variant plane (rows * columns bytes each)
+#   compressed: material run lengths, variant run lengths (uint32 each),
+#               material run values, variant run values (uint8 each)
+#
+# Raw snapshots are opened as copy-on-write memory maps, so loading does not
+# read the planes up front and the simulation can change the world without
+# touching the file. Compressed snapshots map the runs and expand them with
+# one np.repeat per plane.
+
+MAGIC = b"SAND"
+VERSION = 1
+COMPRESSED = 1
+HEADER = struct.Struct("<4sHHIIH2xQQ")
+DATA_OFFSET = 64
+
+class SnapshotError(Exception):
+    pass
+
+def save(grid, path, compress=False):
+    materials = np.ascontiguousarray(grid.materials)
+    # Variants of empty cells are never drawn, zero them so they compress
+    variants = np.where(materials == EMPTY, 0, grid.variants).astype(np.uint8)
+    with open(path, "wb") as file:
+        if compress:
+            material_values, material_lengths = encode_runs(materials)
+            variant_values, variant_lengths = encode_runs(variants)
+            write_header(file, grid, COMPRESSED, len(material_values), len(variant_values))
+            for block in (material_lengths, variant_lengths, material_values, variant_values):
+                file.write(block.tobytes())
+        else:
+            write_header(file, grid, 0, 0, 0)
+            file.write(materials.tobytes())
+            file.write(variants.tobytes())
+
+def load(path):
+    # Returns (materials, variants, cell_size)
+    with open(path, "rb") as file:
+        header = file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise SnapshotError(f"{path} is too short to be a snapshot")
+    magic, version, flags, rows, columns, cell_size, material_runs, variant_runs = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise SnapshotError(f"{path} is not a sand snapshot")
+    if version != VERSION:
+        raise SnapshotError(f"{path} has unsupported snapshot version {version}")
+
+    shape = (rows, columns)
+    runs = material_runs + variant_runs
+    size = 2 * rows * columns if not flags & COMPRESSED else 5 * runs
+    if os.path.getsize(path) < DATA_OFFSET + size:
+        raise SnapshotError(f"{path} is cut short")
+    try:
+        if not flags & COMPRESSED:
+            cells = rows * columns
+            materials = np.memmap(path, dtype=np.uint8, mode="c", offset=DATA_OFFSET, shape=shape)
+            variants = np.memmap(path, dtype=np.uint8, mode="c", offset=DATA_OFFSET + cells, shape=shape)
+        else:
+            lengths = np.memmap(path, dtype=np.uint32, mode="r", offset=DATA_OFFSET, shape=(runs,))
+            values = np.memmap(path, dtype=np.uint8, mode="r", offset=DATA_OFFSET + 4 * runs, shape=(runs,))
+            materials = decode_runs(values[:material_runs], lengths[:material_runs], shape, path)
+            variants = decode_runs(values[material_runs:], lengths[material_runs:], shape, path)
+    except (ValueError, OSError) as error:
+        raise SnapshotError(f"{path} is damaged: {error}") from error
+    # Ids past the material table would only fail later, on drawing or
+    # stepping the cell
+    if materials.size and int(materials.max()) >= len(MATERIALS):
+        raise SnapshotError(f"{path} holds unknown material {int(materials.max())}")
+    return materials, variants, cell_size
+
+def load_grid(path):
+    from grid import Grid
+    materials, variants, cell_size = load(path)
+    rows, columns = materials.shape
+    grid = Grid(columns * cell_size, rows * cell_size, cell_size)
+    grid.use_planes(materials, variants)
+    return grid
+
+def write_header(file, grid, flags, material_runs, variant_runs):
+    header = HEADER.pack(MAGIC, VERSION, flags, grid.rows, grid.columns, grid.cell_size,
+                         material_runs, variant_runs)
+    file.write(header.ljust(DATA_OFFSET, b"\0"))
+
+def encode_runs(plane):
+    flat = plane.reshape(-1)
+    if flat.size == 0:
+        return np.zeros(0, dtype=np.uint8), np.zeros(0, dtype=np.uint32)
+    starts = np.concatenate(([0], np.flatnonzero(flat[1:] != flat[:-1]) + 1))
+    lengths = np.diff(np.append(starts, flat.size)).astype(np.uint32)
+    return flat[starts], lengths
+
+def decode_runs(values, lengths, shape, path):
+    # Checked before expanding, damaged lengths could ask for any amount of
+    # memory
+    if int(np.asarray(lengths).sum(dtype=np.uint64)) != shape[0] * shape[1]:
+        raise SnapshotError(f"{path} has runs that do not cover the grid")
+    return np.repeat(np.asarray(values), np.asarray(lengths)).reshape(shape)
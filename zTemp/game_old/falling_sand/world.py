@@ -0,0 +1,339 @@
+import json
+import math
+import os
+import sys
+import tempfile
+from collections import OrderedDict
+import numpy as np
+import pygame
+from materials import EMPTY, SAND, FLAGS, FALL, RISE
+from simulation import Simulation
+
+# Unbounded sand world.
+#
+# The world is made of REGION x REGION cell regions addressed by (region
+# row, region column), any integers. Only the regions around the camera are
+# simulated: they are copied into one ordinary Grid, the working grid, that
+# moves with the camera. Everything else is frozen in a RegionStore, which
+# keeps the most recently used regions in memory and pages the rest out to a
+# memory mapped file. Memory stays bounded however far the world is explored,
+# only the slot index grows, by one entry per region that ever held
+# something.
+#
+# The edges of the working grid are not the edges of the world. A falling
+# cell on its bottom row, or a rising one on its top row, is handed to the
+# frozen region past the edge, where it lands on whatever that region holds
+# in its column, or at the far end of an empty one, and moves on once that
+# region is loaded again. The sides are still walls.
+
+REGION = 64
+# Regions of working grid kept around the view on every side
+MARGIN = 1
+MIN_ZOOM = 2
+MAX_ZOOM = 16
+# Pixels the camera moves per frame while an arrow key is held
+PAN_SPEED = 12
+STORE_PATH = "world.regions"
+
+class RegionStore:
+    def __init__(self, path=STORE_PATH, resident=256):
+        self.path = path
+        self.index_path = path + ".json"
+        self.resident = resident
+        # (region row, region column) -> (2, REGION, REGION) materials and
+        # variants, least recently used first
+        self.cache = OrderedDict()
+        self.slots = {}
+        self.capacity = 0
+        self.data = None
+        if os.path.exists(self.index_path) and os.path.exists(path):
+            with open(self.index_path) as file:
+                self.slots = {(row, column): slot for row, column, slot in json.load(file)}
+            self.map(os.path.getsize(path) // slot_size())
+
+    def load(self, key, materials, variants):
+        planes = self.fetch(key)
+        materials[:] = planes[0]
+        variants[:] = planes[1]
+
+    def save(self, key, materials, variants):
+        planes = self.fetch(key)
+        planes[0] = materials
+        planes[1] = variants
+
+    def fetch(self, key):
+        planes = self.cache.get(key)
+        if planes is not None:
+            self.cache.move_to_end(key)
+            return planes
+        planes = np.zeros((2, REGION, REGION), dtype=np.uint8)
+        slot = self.slots.get(key)
+        if slot is not None:
+            planes[:] = self.data[slot]
+        self.cache[key] = planes
+        while len(self.cache) > self.resident:
+            self.page_out(*self.cache.popitem(last=False))
+        return planes
+
+    def page_out(self, key, planes):
+        slot = self.slots.get(key)
+        if slot is None:
+            # Empty regions are only written over ones that held something
+            if not planes[0].any():
+                return
+            slot = len(self.slots)
+            if slot >= self.capacity:
+                self.map(max(2 * self.capacity, 64))
+            self.slots[key] = slot
+        self.data[slot] = planes
+
+    def map(self, capacity):
+        if self.data is not None:
+            self.data.flush()
+            del self.data
+        with open(self.path, "ab") as file:
+            file.truncate(capacity * slot_size())
+        self.capacity = capacity
+        self.data = np.memmap(self.path, dtype=np.uint8, mode="r+", shape=(capacity, 2, REGION, REGION))
+
+    def flush(self):
+        for key, planes in self.cache.items():
+            self.page_out(key, planes)
+        if self.data is not None:
+            self.data.flush()
+        with open(self.index_path, "w") as file:
+            json.dump([[row, column, slot] for (row, column), slot in self.slots.items()], file)
+
+def slot_size():
+    return 2 * REGION * REGION
+
+def centered_origin(start, length, regions):
+    # First region of a span of regions that has the cells from start to
+    # start + length in its middle, at least MARGIN regions from either end
+    first = math.floor(start / REGION)
+    last = math.ceil((start + length) / REGION) - 1
+    spare = regions - 2 * MARGIN - (last - first + 1)
+    return first - MARGIN - spare // 2
+
+class WorldSimulation(Simulation):
+    def __init__(self, width, height, store=None, zoom=4, engine="vectorized"):
+        self.view_width = width
+        self.view_height = height
+        self.zoom = zoom
+        # The working grid covers the view at the smallest zoom plus a margin.
+        # A view not lined up with the regions reaches into one more region,
+        # hence the + 1, without it the view could never fit inside the
+        # margin and every tick would recenter.
+        self.region_rows = -(-height // (MIN_ZOOM * REGION)) + 2 * MARGIN + 1
+        self.region_columns = -(-width // (MIN_ZOOM * REGION)) + 2 * MARGIN + 1
+        self.reloads = 0
+        super().__init__(self.region_columns * REGION, self.region_rows * REGION, 1, engine)
+        self.store = store or RegionStore(resident=4 * self.region_rows * self.region_columns)
+        self.store.resident = max(self.store.resident, 2 * self.region_rows * self.region_columns)
+        # World cell at the top left of the view, and region at the top left
+        # of the working grid
+        self.camera = [0.0, 0.0]
+        self.origin = (-MARGIN, -MARGIN)
+        self.canvas = pygame.Surface((self.grid.columns, self.grid.rows))
+        self.load_regions()
+
+    def view_cells(self):
+        return self.view_height / self.zoom, self.view_width / self.zoom
+
+    def update(self):
+        self.follow_camera()
+        self.hand_off(-1, FALL, self.region_rows)
+        self.hand_off(0, RISE, -1)
+        super().update()
+
+    def hand_off(self, row, bit, region_row):
+        # Moves the cells on an edge row with a move flag into the regions
+        # past it, region_row counted from the working grid's first one
+        materials = self.grid.materials
+        variants = self.grid.variants
+        leaving = FLAGS[materials[row]] & bit != 0
+        if not leaving.any():
+            return
+        for region_column in np.unique(np.flatnonzero(leaving) // REGION).tolist():
+            cells = slice(region_column * REGION, (region_column + 1) * REGION)
+            planes = self.store.fetch((self.origin[0] + region_row, self.origin[1] + region_column))
+            # Rising cells land from the bottom of the region above up
+            if bit == RISE:
+                planes = planes[:, ::-1]
+            filled = planes[0] != EMPTY
+            # Last empty cell before the first full one of every column
+            landing = np.where(filled.any(axis=0), filled.argmax(axis=0), REGION) - 1
+            leaving[cells] &= landing >= 0
+            columns = np.flatnonzero(leaving[cells])
+            planes[0][landing[columns], columns] = materials[row, cells][columns]
+            planes[1][landing[columns], columns] = variants[row, cells][columns]
+        materials[row][leaving] = EMPTY
+        self.grid.mark_changed(leaving[None], row % self.grid.rows, 0, wake=True)
+
+    def follow_camera(self):
+        # Recenter the working grid once the view gets into its margin
+        rows, columns = self.view_cells()
+        top = self.camera[0] - self.origin[0] * REGION
+        left = self.camera[1] - self.origin[1] * REGION
+        inner = MARGIN * REGION
+        if (top >= inner and left >= inner and top + rows <= self.grid.rows - inner
+                and left + columns <= self.grid.columns - inner):
+            return
+        origin = (centered_origin(self.camera[0], rows, self.region_rows),
+                  centered_origin(self.camera[1], columns, self.region_columns))
+        self.reloads += 1
+        self.save_regions()
+        self.shift_heat(origin)
+        self.origin = origin
+        self.load_regions()
+
+    def regions(self):
+        for row in range(self.region_rows):
+            for column in range(self.region_columns):
+                cells = (slice(row * REGION, (row + 1) * REGION), slice(column * REGION, (column + 1) * REGION))
+                yield (self.origin[0] + row, self.origin[1] + column), cells
+
+    def load_regions(self):
+        for key, cells in self.regions():
+            self.store.load(key, self.grid.materials[cells], self.grid.variants[cells])
+        self.grid.mark_all()
+
+    def save_regions(self):
+        for key, cells in self.regions():
+            self.store.save(key, self.grid.materials[cells], self.grid.variants[cells])
+
+    def shift_heat(self, origin):
+        # Temperature is only kept for the working grid, the part the old and
+        # new grid share is moved along and the rest starts at ambient
+        temperature = self.heat.temperature
+        shifted = np.full_like(temperature, self.heat.ambient)
+        row_shift = (origin[0] - self.origin[0]) * REGION
+        column_shift = (origin[1] - self.origin[1]) * REGION
+        rows, columns = temperature.shape
+        if abs(row_shift) < rows and abs(column_shift) < columns:
+            source = (slice(max(row_shift, 0), rows + min(row_shift, 0)),
+                      slice(max(column_shift, 0), columns + min(column_shift, 0)))
+            target = (slice(max(-row_shift, 0), rows + min(-row_shift, 0)),
+                      slice(max(-column_shift, 0), columns + min(-column_shift, 0)))
+            shifted[target] = temperature[source]
+        temperature[:] = shifted
+        self.heat.active[:] = True
+
+    def grid_cell(self, position):
+        # Working grid cell under a window pixel
+        row = math.floor(self.camera[0] + position[1] / self.zoom) - self.origin[0] * REGION
+        column = math.floor(self.camera[1] + position[0] / self.zoom) - self.origin[1] * REGION
+        return row, column
+
+    def draw(self, window):
+        self.canvas.fill((29, 29, 29))
+        self.grid.draw(self.canvas)
+        rows, columns = self.view_cells()
+        top, left = self.grid_cell((0, 0))
+        view = pygame.Rect(left, top, int(columns) + 1, int(rows) + 1).clip(self.canvas.get_rect())
+        scaled = pygame.transform.scale(self.canvas.subsurface(view), (view.width * self.zoom, view.height * self.zoom))
+        # Cells only partly in view are shifted out past the window edge
+        window.blit(scaled, (-int(self.camera[1] % 1 * self.zoom), -int(self.camera[0] % 1 * self.zoom)))
+        self.draw_brush(window)
+
+    def draw_brush(self, window):
+        position = pygame.mouse.get_pos()
+        radius = int((self.brush.radius + 0.5) * self.zoom)
+        pygame.draw.circle(window, (255, 255, 255), position, radius, 2)
+
+    def handle_controls(self):
+        super().handle_controls()
+        keys = pygame.key.get_pressed()
+        step = PAN_SPEED / self.zoom
+        self.camera[0] += (keys[pygame.K_DOWN] - keys[pygame.K_UP]) * step
+        self.camera[1] += (keys[pygame.K_RIGHT] - keys[pygame.K_LEFT]) * step
+
+    def handle_key(self, event):
+        if event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_MINUS):
+            self.set_zoom(self.zoom * 2 if event.key != pygame.K_MINUS else self.zoom // 2)
+        else:
+            super().handle_key(event)
+
+    def set_zoom(self, zoom):
+        # Zoom about the middle of the view
+        zoom = min(max(zoom, MIN_ZOOM), MAX_ZOOM)
+        rows, columns = self.view_cells()
+        center = (self.camera[0] + rows / 2, self.camera[1] + columns / 2)
+        self.zoom = zoom
+        rows, columns = self.view_cells()
+        self.camera = [center[0] - rows / 2, center[1] - columns / 2]
+
+    def handle_mouse(self):
+        buttons = pygame.mouse.get_pressed()
+        if buttons[0]:
+            row, column = self.grid_cell(pygame.mouse.get_pos())
+            self.paint(self.brush.stroke(row, column, self.grid.rows, self.grid.columns))
+        else:
+            self.brush.release()
+
+    def close(self):
+        self.save_regions()
+        self.store.flush()
+        super().close()
+
+def reload_check(width=800, height=600, ticks=200):
+    # Zooms all the way out and pans around, the working grid has to be
+    # reloaded about once per region the camera crosses and never per tick.
+    # Returns what went wrong, nothing when all is well.
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        world = WorldSimulation(width, height, RegionStore(os.path.join(directory, STORE_PATH)))
+        world.set_zoom(MIN_ZOOM)
+        for _ in range(10):
+            world.update()
+        if world.reloads > 1:
+            failures.append(f"{width}x{height}: {world.reloads} reloads in 10 ticks after zooming out")
+        step = PAN_SPEED / world.zoom
+        for row_step, column_step in ((0, 1), (1, 0), (0, -1), (-1, 0), (1, 1)):
+            before = world.reloads
+            for _ in range(ticks):
+                world.camera[0] += row_step * step
+                world.camera[1] += column_step * step
+                world.update()
+            crossed = math.ceil(ticks * step / REGION) * (abs(row_step) + abs(column_step))
+            if world.reloads - before > crossed + 1:
+                failures.append(f"{width}x{height}: {world.reloads - before} reloads panning "
+                                f"({row_step}, {column_step}) across {crossed} regions")
+        print(f"{width}x{height}: {world.reloads} reloads in {10 + 5 * ticks} ticks")
+        world.close()
+    return failures
+
+def edge_check(width=800, height=600, ticks=600):
+    # Sand poured into an empty world has to fall out of the bottom of the
+    # working grid into the regions below, all of it, instead of piling up
+    # on the grid's last row. Returns what went wrong like reload_check.
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, STORE_PATH)
+        world = WorldSimulation(width, height, RegionStore(path))
+        world.grid.paint(70, 0, np.ones((10, world.grid.columns), dtype=bool), SAND)
+        poured = np.count_nonzero(world.grid.materials == SAND)
+        for _ in range(ticks):
+            world.update()
+        rows = np.flatnonzero((world.grid.materials == SAND).any(axis=1))
+        if len(rows):
+            failures.append(f"{width}x{height}: sand still on rows {rows[0]} to {rows[-1]} of the "
+                            f"{world.grid.rows} row working grid after {ticks} ticks")
+        world.close()
+        store = RegionStore(path)
+        stored = sum(np.count_nonzero(store.fetch(key)[0] == SAND) for key in list(store.slots))
+        if stored != poured:
+            failures.append(f"{width}x{height}: {poured} grains poured, {stored} in the store")
+        if not failures:
+            print(f"{width}x{height}: all {poured} grains fell out of the working grid")
+    return failures
+
+if __name__ == "__main__":
+    pygame.init()
+    failures = edge_check()
+    for width, height in ((800, 600), (640, 480), (1920, 1080)):
+        failures += reload_check(width, height)
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    if failures:
+        sys.exit(1)
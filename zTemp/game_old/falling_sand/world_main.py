@@ -0,0 +1,33 @@
+import pygame
+from world import WorldSimulation
+from loop import FixedStepLoop
+
+# Entry point for the unbounded world: arrow keys pan, + and - zoom, the
+# material keys and brush work as in main.py
+
+pygame.init()
+pygame.mouse.set_visible(False)
+
+WINDOW_WIDTH = 800
+WINDOW_HEIGHT = 600
+TICK_RATE = 120
+GREY = (29, 29, 29)
+
+window = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+pygame.display.set_caption("Falling Sand World")
+
+simulation = WorldSimulation(WINDOW_WIDTH, WINDOW_HEIGHT)
+
+def render():
+    window.fill(GREY)
+    simulation.draw(window)
+    pygame.display.flip()
+
+loop = FixedStepLoop(simulation.update, render, TICK_RATE)
+try:
+    while True:
+        simulation.handle_controls()
+        loop.frame()
+finally:
+    # Page the working regions out so the world is there next time
+    simulation.close()
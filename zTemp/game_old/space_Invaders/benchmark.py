@@ -0,0 +1,128 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+import argparse
+import random
+import time
+import pygame
+from game import Game
+from laser import Laser
+
+# Stress test of Game.check_for_collisions without a window.
+#
+# Hundreds of lasers are kept flying at once, both ways, through the aliens
+# and the obstacles, and only the collision check is timed. The same frames
+# are played by a second game checked without the spatial hash, one
+# spritecollide per laser against every alien and a mask test against every
+# obstacle, so the two costs can be compared and the outcomes checked to be
+# the same.
+#
+#   python benchmark.py --lasers 400 --frames 300
+
+SCREEN_WIDTH = 750
+SCREEN_HEIGHT = 700
+OFFSET = 50
+
+def hit_every_obstacle(game, rect):
+    hit = False
+    for obstacle in game.obstacles.sprites():
+        if obstacle.hit(rect):
+            hit = True
+    return hit
+
+def brute_force_collisions(game):
+    # check_for_collisions without the spatial hash
+    for laser_sprite in game.spaceship_group.sprite.lasers_group:
+        aliens_hit = pygame.sprite.spritecollide(laser_sprite, game.aliens_group, True)
+        if aliens_hit:
+            for alien in aliens_hit:
+                game.score += alien.type * 100
+                laser_sprite.kill()
+        if pygame.sprite.spritecollide(laser_sprite, game.mystery_ship_group, True):
+            game.score += 500
+            laser_sprite.kill()
+        if hit_every_obstacle(game, laser_sprite.rect):
+            laser_sprite.kill()
+
+    for laser_sprite in game.alien_lasers_group:
+        if pygame.sprite.spritecollide(laser_sprite, game.spaceship_group, False):
+            laser_sprite.kill()
+            game.lives -= 1
+            if game.lives == 0:
+                game.game_over()
+        if hit_every_obstacle(game, laser_sprite.rect):
+            laser_sprite.kill()
+
+    for alien in game.aliens_group:
+        hit_every_obstacle(game, alien.rect)
+        if pygame.sprite.spritecollide(alien, game.spaceship_group, False):
+            game.game_over()
+
+def new_game():
+    game = Game(SCREEN_WIDTH, SCREEN_HEIGHT, OFFSET)
+    # No score of a benchmark goes to highscore.txt
+    game.highscore = float("inf")
+    game.explosion_sound.set_volume(0)
+    return game
+
+def add_lasers(game, rng, count):
+    # Tops both kinds of lasers up to count each
+    player_lasers = game.spaceship_group.sprite.lasers_group
+    while len(player_lasers) < count:
+        player_lasers.add(Laser((rng.uniform(OFFSET, SCREEN_WIDTH), rng.uniform(100, SCREEN_HEIGHT)), 5, SCREEN_HEIGHT))
+    while len(game.alien_lasers_group) < count:
+        game.alien_lasers_group.add(Laser((rng.uniform(OFFSET, SCREEN_WIDTH), rng.uniform(100, SCREEN_HEIGHT)), -6,
+                                          SCREEN_HEIGHT))
+
+def step(game, rng, lasers, check):
+    # New aliens and obstacles when the lasers have worn them down, so every
+    # frame has targets
+    if len(game.aliens_group) < 20:
+        game.aliens_group.empty()
+        game.create_aliens()
+    if shield_pixels(game) < 4500:
+        game.obstacles = game.create_obstacles()
+    add_lasers(game, rng, lasers)
+    game.spaceship_group.sprite.lasers_group.update()
+    game.move_aliens()
+    game.alien_lasers_group.update()
+    began = time.perf_counter()
+    check(game)
+    return time.perf_counter() - began
+
+def shield_pixels(game):
+    return sum(obstacle.mask.count() for obstacle in game.obstacles)
+
+def state(game):
+    return (game.score, game.lives, len(game.aliens_group), len(game.spaceship_group.sprite.lasers_group),
+            len(game.alien_lasers_group), [pygame.image.tobytes(obstacle.image, "RGBA") for obstacle in game.obstacles])
+
+def benchmark(lasers, frames, seed):
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    games = (new_game(), new_game())
+    checks = (Game.check_for_collisions, brute_force_collisions)
+    rngs = (random.Random(seed), random.Random(seed))
+    times = ([], [])
+    for frame in range(frames):
+        for game, rng, check, spent in zip(games, rngs, checks, times):
+            spent.append(step(game, rng, lasers, check))
+        if state(games[0]) != state(games[1]):
+            raise AssertionError(f"spatial hash and spritecollide differ at frame {frame}")
+    hashed, brute = (sum(spent) / frames * 1000 for spent in times)
+    print(f"{lasers} lasers each way, {frames} frames, outcomes match")
+    print(f"spatial hash   {hashed:.3f} ms per frame")
+    print(f"every sprite   {brute:.3f} ms per frame, {brute / hashed:.1f}x")
+    game = games[0]
+    print(f"{len(game.aliens_group)} aliens and {shield_pixels(game)} obstacle pixels left, score {game.score}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the Space Invaders collision checks under load")
+    parser.add_argument("--lasers", type=int, default=400, help="lasers kept flying each way")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    benchmark(args.lasers, args.frames, args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,11 @@ from obstacle import grid
 from alien import Alien
 from laser import Laser
 from alien import MysteryShip
+from spatial_hash import SpatialGroup
+
+# Cell sizes of the collision grids, about an alien and an obstacle
+ALIEN_CELL_SIZE = 64
+OBSTACLE_CELL_SIZE = 64
 
 class Game:
     def __init__(self, screen_width, screen_height, offset):
@@ -14,7 +19,7 @@ class Game:
         self.spaceship_group = pygame.sprite.GroupSingle()
         self.spaceship_group.add(Spaceship(self.screen_width, self.screen_height, self.offset))
         self.obstacles = self.create_obstacles()
-        self.aliens_group = pygame.sprite.Group()
+        self.aliens_group = SpatialGroup(ALIEN_CELL_SIZE)
         self.create_aliens()
         self.aliens_direction = 1
         self.alien_lasers_group = pygame.sprite.Group()
@@ -31,11 +36,11 @@ class Game:
     def create_obstacles(self):
         obstacle_width = len(grid[0]) * 3
         gap = (self.screen_width + self.offset - (4 * obstacle_width))/5
-        obstacles = []
+        obstacles = SpatialGroup(OBSTACLE_CELL_SIZE)
         for i in range(4):
             offset_x = (i + 1) * gap + i * obstacle_width
             obstacle = Obstacle(offset_x, self.screen_height - 100)
-            obstacles.append(obstacle)
+            obstacles.add(obstacle)
         return obstacles
     
     def create_aliens(self):
@@ -65,6 +70,7 @@ class Game:
             elif alien.rect.left <= self.offset/2:
                 self.aliens_direction = 1
                 self.alien_move_down(2)
+        self.aliens_group.rehash()
 
     def alien_move_down(self, distance):
         if self.aliens_group:
@@ -85,7 +91,7 @@ class Game:
         if self.spaceship_group.sprite.lasers_group:
             for laser_sprite in self.spaceship_group.sprite.lasers_group:
                 
-                aliens_hit = pygame.sprite.spritecollide(laser_sprite, self.aliens_group, True)
+                aliens_hit = self.aliens_group.collide(laser_sprite, True)
                 if aliens_hit:
                     self.explosion_sound.play()
                     for alien in aliens_hit:
@@ -99,9 +105,8 @@ class Game:
                     self.check_for_highscore()
                     laser_sprite.kill()
 
-                for obstacle in self.obstacles:
-                    if pygame.sprite.spritecollide(laser_sprite, obstacle.blocks_group, True):
-                        laser_sprite.kill()
+                if self.hit_obstacles(laser_sprite.rect):
+                    laser_sprite.kill()
                         
         #Alien Lasers
         if self.alien_lasers_group:
@@ -112,18 +117,24 @@ class Game:
                     if self.lives == 0:
                         self.game_over()
                 
-                for obstacle in self.obstacles:
-                    if pygame.sprite.spritecollide(laser_sprite, obstacle.blocks_group, True):
-                        laser_sprite.kill()
+                if self.hit_obstacles(laser_sprite.rect):
+                    laser_sprite.kill()
 
         if self.aliens_group:
             for alien in self.aliens_group:
-                for obstacle in self.obstacles:
-                    pygame.sprite.spritecollide(alien, obstacle.blocks_group, True)
+                self.hit_obstacles(alien.rect)
 
                 if pygame.sprite.spritecollide(alien, self.spaceship_group, False):
                     self.game_over()
 
+    def hit_obstacles(self, rect):
+        # Craters every obstacle under rect, True when it hit one
+        hit = False
+        for obstacle in self.obstacles.near(rect):
+            if obstacle.hit(rect):
+                hit = True
+        return hit
+
     def game_over(self):
         self.run = False
 
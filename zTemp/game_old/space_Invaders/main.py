@@ -97,8 +97,7 @@ while True:
 
     game.spaceship_group.draw(screen)
     game.spaceship_group.sprite.lasers_group.draw(screen)
-    for obstacles in game.obstacles:
-        obstacles.blocks_group.draw(screen)
+    game.obstacles.draw(screen)
     game.aliens_group.draw(screen)
     game.alien_lasers_group.draw(screen)
     game.mystery_ship_group.draw(screen)
@@ -1,12 +1,5 @@
 import pygame
 
-class Block(pygame.sprite.Sprite):
-    def __init__(self, x, y):
-        super().__init__()
-        self.image = pygame.Surface((3,3))
-        self.image.fill((243,216,63))
-        self.rect = self.image.get_rect(topleft = (x,y))
-
 grid = [
 [0,0,0,0,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,0,0,0,0],
 [0,0,0,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,0,0,0],
@@ -23,13 +16,39 @@ grid = [
 [1,1,1,1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1,1,1,1]
 ]
 
-class Obstacle:
+# Side of one cell of the grid above, in pixels
+BLOCK_SIZE = 3
+COLOR = (243, 216, 63)
+
+# A shield is one surface and the mask of its pixels still standing. A hit
+# clears a crater, the grid cells the hitting rect overlaps, from both, so
+# it wears down the way the old shields of one sprite per cell did while a
+# collision is one mask test and drawing is one blit.
+class Obstacle(pygame.sprite.Sprite):
     def __init__(self, x, y):
-        self.blocks_group = pygame.sprite.Group()
+        super().__init__()
+        self.image = pygame.Surface((len(grid[0]) * BLOCK_SIZE, len(grid) * BLOCK_SIZE), pygame.SRCALPHA)
         for row in range(len(grid)):
             for column in range(len(grid[0])):
                 if grid[row][column] == 1:
-                    pos_x = x + column * 3
-                    pos_y = y + row * 3
-                    block = Block(pos_x, pos_y)
-                    self.blocks_group.add(block)
\ No newline at end of file
+                    self.image.fill(COLOR, (column * BLOCK_SIZE, row * BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE))
+        self.rect = self.image.get_rect(topleft = (x, y))
+        self.mask = pygame.mask.from_surface(self.image)
+
+    def hit(self, rect):
+        # Clears the crater of rect, returns whether it touched the shield
+        left = rect.left - self.rect.left
+        top = rect.top - self.rect.top
+        if not self.mask.overlap(pygame.Mask(rect.size, fill=True), (left, top)):
+            return False
+        crater_left = left // BLOCK_SIZE * BLOCK_SIZE
+        crater_top = top // BLOCK_SIZE * BLOCK_SIZE
+        crater_right = -(-(left + rect.width) // BLOCK_SIZE) * BLOCK_SIZE
+        crater_bottom = -(-(top + rect.height) // BLOCK_SIZE) * BLOCK_SIZE
+        crater = pygame.Rect(crater_left, crater_top, crater_right - crater_left, crater_bottom - crater_top)
+        # Surface.fill clears the wrong rows for a rect reaching above the
+        # surface, so the crater is kept inside it
+        crater = crater.clip(self.image.get_rect())
+        self.mask.erase(pygame.Mask(crater.size, fill=True), crater.topleft)
+        self.image.fill((0, 0, 0, 0), crater)
+        return True
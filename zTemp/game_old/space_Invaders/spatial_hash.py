@@ -0,0 +1,102 @@
+import pygame
+
+# Uniform grid broadphase for the collision checks.
+#
+# The screen is cut into square cells and every sprite of a SpatialGroup is
+# listed in the buckets of the cells its rect covers, so a collision test
+# looks at the sprites sharing a bucket with the rect instead of the whole
+# group. Sprites join and leave the buckets as they are added to and killed
+# from the group. A sprite that moved is moved between buckets by rehash,
+# which does nothing when it stays in the same cells, the common case for
+# sprites moving a few pixels a frame.
+
+class SpatialHash:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        # (cell x, cell y) -> set of sprites
+        self.buckets = {}
+        # sprite -> (left, top, right, bottom) cells it is in
+        self.spans = {}
+
+    def span(self, rect):
+        size = self.cell_size
+        return (rect.left // size, rect.top // size, (rect.right - 1) // size, (rect.bottom - 1) // size)
+
+    def insert(self, sprite):
+        span = self.span(sprite.rect)
+        self.spans[sprite] = span
+        left, top, right, bottom = span
+        buckets = self.buckets
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                bucket = buckets.get((x, y))
+                if bucket is None:
+                    buckets[(x, y)] = {sprite}
+                else:
+                    bucket.add(sprite)
+
+    def remove(self, sprite):
+        left, top, right, bottom = self.spans.pop(sprite)
+        buckets = self.buckets
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                bucket = buckets[(x, y)]
+                bucket.discard(sprite)
+                if not bucket:
+                    del buckets[(x, y)]
+
+    def move(self, sprite):
+        if self.span(sprite.rect) != self.spans[sprite]:
+            self.remove(sprite)
+            self.insert(sprite)
+
+    def query(self, rect):
+        # Every sprite in a cell the rect covers, some of them may not touch it
+        left, top, right, bottom = self.span(rect)
+        buckets = self.buckets
+        if left == right and top == bottom:
+            return set(buckets.get((left, top), ()))
+        found = set()
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                bucket = buckets.get((x, y))
+                if bucket:
+                    found |= bucket
+        return found
+
+    def clear(self):
+        self.buckets = {}
+        self.spans = {}
+
+class SpatialGroup(pygame.sprite.Group):
+    def __init__(self, cell_size, *sprites):
+        self.hash = SpatialHash(cell_size)
+        super().__init__(*sprites)
+
+    def add_internal(self, sprite, layer=None):
+        if sprite not in self.spritedict:
+            self.hash.insert(sprite)
+        super().add_internal(sprite)
+
+    def remove_internal(self, sprite):
+        self.hash.remove(sprite)
+        super().remove_internal(sprite)
+
+    def rehash(self):
+        # After the sprites moved
+        move = self.hash.move
+        for sprite in self.spritedict:
+            move(sprite)
+
+    def near(self, rect):
+        # The sprites whose rects overlap rect
+        return [other for other in self.hash.query(rect) if rect.colliderect(other.rect)]
+
+    def collide(self, sprite, dokill):
+        # Like pygame.sprite.spritecollide(sprite, self, dokill), testing
+        # only the sprites near it
+        hit = self.near(sprite.rect)
+        if dokill:
+            for other in hit:
+                other.kill()
+        return hit
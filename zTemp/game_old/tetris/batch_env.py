@@ -0,0 +1,311 @@
+import argparse
+import time
+import numpy as np
+from bitboard import Bitboard
+from bot import Bot
+from engine import Tetris, BAG, LINE_SCORES
+from shapes import ROTATIONS, SPAWN_COLUMNS
+
+# N Tetris boards stepped together with NumPy, for batch experiments.
+#
+# Every board is a row of bitboard masks, rows[board, row] with bit c set
+# when column c is taken, like Bitboard, and ids[board, row, column] keeps
+# the piece id of every cell. The falling block of each board is its piece,
+# rotation, row and column. step takes one action per board and applies
+# every kind of action to all the boards that chose it at once, with the
+# rules of Tetris in engine.py: a move or rotation that does not fit is
+# undone, a move down that does not fit locks the block, full rows are
+# cleared and scored with LINE_SCORES. A board whose next block does not fit
+# is over, it is reported done and starts again right away.
+#
+#   python batch_env.py                 steps per second with N=1024
+#   python batch_env.py --verify        compares every board with Tetris
+
+NOOP, LEFT, RIGHT, DOWN, ROTATE, DROP = range(6)
+
+NUM_ROWS = 20
+NUM_COLS = 10
+FULL = (1 << NUM_COLS) - 1
+
+# Rotation tables of shapes.py as arrays indexed by [piece, rotation]
+MASKS = np.zeros((8, 4, 4), dtype=np.int32)
+CELLS = np.zeros((8, 4, 4, 2), dtype=np.int32)
+BOUNDS = np.zeros((4, 8, 4), dtype=np.int32)
+for id, rotations in ROTATIONS.items():
+    for state, rotation in enumerate(rotations):
+        MASKS[id, state, :len(rotation.masks)] = rotation.masks
+        CELLS[id, state] = rotation.cells
+        BOUNDS[:, id, state] = rotation.top, rotation.bottom, rotation.left, rotation.right
+TOP, BOTTOM, LEFT_EDGE, RIGHT_EDGE = BOUNDS
+SPAWN = np.zeros(8, dtype=np.int32)
+for id, column in SPAWN_COLUMNS.items():
+    SPAWN[id] = column
+SCORES = np.array([LINE_SCORES.get(lines, 0) for lines in range(5)], dtype=np.int64)
+BAG_IDS = np.array(BAG, dtype=np.int8)
+BOX_ROWS = np.arange(4)
+
+class BatchTetris:
+    def __init__(self, boards, seed=None, record=False):
+        self.boards = boards
+        self.rng = np.random.default_rng(seed)
+        self.rows = np.zeros((boards, NUM_ROWS), dtype=np.int32)
+        self.ids = np.zeros((boards, NUM_ROWS, NUM_COLS), dtype=np.uint8)
+        self.piece = np.zeros(boards, dtype=np.int32)
+        self.next_piece = np.zeros(boards, dtype=np.int32)
+        self.rotation = np.zeros(boards, dtype=np.int32)
+        self.row = np.zeros(boards, dtype=np.int32)
+        self.column = np.zeros(boards, dtype=np.int32)
+        self.score = np.zeros(boards, dtype=np.int64)
+        self.lines = np.zeros(boards, dtype=np.int64)
+        self.pieces = np.zeros(boards, dtype=np.int64)
+        # Each board's 7-bag, the rest of it from bag_position on
+        self.bag = np.zeros((boards, 7), dtype=np.int8)
+        self.bag_position = np.zeros(boards, dtype=np.int32)
+        # With record, (boards, ids) of every draw in order, to replay the
+        # same pieces elsewhere
+        self.drawn = [] if record else None
+        self.reset(np.arange(boards))
+
+    def reset(self, boards):
+        self.rows[boards] = 0
+        self.ids[boards] = 0
+        self.score[boards] = 0
+        self.lines[boards] = 0
+        self.pieces[boards] = 0
+        self.refill(boards)
+        self.piece[boards] = self.draw(boards)
+        self.next_piece[boards] = self.draw(boards)
+        self.spawn(boards)
+
+    def refill(self, boards):
+        self.bag[boards] = BAG_IDS[np.argsort(self.rng.random((len(boards), 7)), axis=1)]
+        self.bag_position[boards] = 0
+
+    def draw(self, boards):
+        ids = self.bag[boards, self.bag_position[boards]].astype(np.int32)
+        self.bag_position[boards] += 1
+        empty = boards[self.bag_position[boards] == 7]
+        if len(empty):
+            self.refill(empty)
+        if self.drawn is not None:
+            self.drawn.append((boards.copy(), ids))
+        return ids
+
+    def spawn(self, boards):
+        self.rotation[boards] = 0
+        self.row[boards] = 0
+        self.column[boards] = SPAWN[self.piece[boards]]
+
+    def fits(self, boards, rotation, row, column):
+        # Whether the boards' pieces fit in the given rotations and places
+        piece = self.piece[boards]
+        inside = ((row + TOP[piece, rotation] >= 0) & (row + BOTTOM[piece, rotation] < NUM_ROWS)
+                  & (column + LEFT_EDGE[piece, rotation] >= 0) & (column + RIGHT_EDGE[piece, rotation] < NUM_COLS))
+        shifted = shift(MASKS[piece, rotation], column)
+        under = self.rows[boards[:, None], np.clip(row[:, None] + BOX_ROWS, 0, NUM_ROWS - 1)]
+        return inside & ~(shifted & under).any(axis=1)
+
+    def step(self, actions):
+        # Returns the points every board scored and which boards ended
+        actions = np.asarray(actions)
+        rewards = np.zeros(self.boards, dtype=np.int64)
+        done = np.zeros(self.boards, dtype=bool)
+
+        for action, columns in ((LEFT, -1), (RIGHT, 1)):
+            boards = np.flatnonzero(actions == action)
+            if len(boards):
+                column = self.column[boards] + columns
+                moved = self.fits(boards, self.rotation[boards], self.row[boards], column)
+                self.column[boards[moved]] = column[moved]
+
+        boards = np.flatnonzero(actions == ROTATE)
+        if len(boards):
+            rotation = (self.rotation[boards] + 1) % 4
+            turned = self.fits(boards, rotation, self.row[boards], self.column[boards])
+            self.rotation[boards[turned]] = rotation[turned]
+
+        landed = []
+        boards = np.flatnonzero(actions == DOWN)
+        if len(boards):
+            row = self.row[boards] + 1
+            moved = self.fits(boards, self.rotation[boards], row, self.column[boards])
+            self.row[boards[moved]] = row[moved]
+            landed.append(boards[~moved])
+
+        boards = np.flatnonzero(actions == DROP)
+        if len(boards):
+            falling = boards
+            while len(falling):
+                row = self.row[falling] + 1
+                moved = self.fits(falling, self.rotation[falling], row, self.column[falling])
+                falling = falling[moved]
+                self.row[falling] = row[moved]
+            landed.append(boards)
+
+        if landed:
+            boards = np.concatenate(landed)
+            if len(boards):
+                rewards[boards], done[boards] = self.lock(boards)
+                self.reset(np.flatnonzero(done))
+        return rewards, done
+
+    def lock(self, boards):
+        piece = self.piece[boards]
+        rotation = self.rotation[boards]
+        row = self.row[boards]
+        column = self.column[boards]
+        shifted = shift(MASKS[piece, rotation], column)
+        for offset in range(4):
+            # Every board comes up once per offset, so |= sees no repeated
+            # index
+            has = shifted[:, offset] != 0
+            self.rows[boards[has], row[has] + offset] |= shifted[has, offset]
+        cells = CELLS[piece, rotation]
+        self.ids[boards[:, None], row[:, None] + cells[..., 0], column[:, None] + cells[..., 1]] = piece[:, None]
+
+        full = self.rows[boards] == FULL
+        counts = full.sum(axis=1)
+        cleared = counts > 0
+        if cleared.any():
+            # Full rows sort to the top, where they are emptied, the others
+            # keep their order below them
+            full = full[cleared]
+            order = np.argsort(~full, axis=1, kind="stable")
+            empty = np.arange(NUM_ROWS) < counts[cleared, None]
+            target = boards[cleared]
+            rows = np.take_along_axis(self.rows[target], order, axis=1)
+            rows[empty] = 0
+            self.rows[target] = rows
+            ids = np.take_along_axis(self.ids[target], order[:, :, None], axis=1)
+            ids[empty] = 0
+            self.ids[target] = ids
+
+        points = SCORES[counts]
+        self.score[boards] += points
+        self.lines[boards] += counts
+        self.pieces[boards] += 1
+        self.piece[boards] = self.next_piece[boards]
+        self.next_piece[boards] = self.draw(boards)
+        self.spawn(boards)
+        over = ~self.fits(boards, self.rotation[boards], self.row[boards], self.column[boards])
+        return points, over
+
+def shift(masks, column):
+    # Box row masks moved to the board column, bit 0 at the box's left edge
+    column = column[:, None]
+    return np.where(column >= 0, masks << np.maximum(column, 0), masks >> np.maximum(-column, 0))
+
+class FedTetris(Tetris):
+    # Scalar engine that takes its pieces from a list instead of its bag
+    def __init__(self, feed):
+        self.feed = feed
+        super().__init__(board=Bitboard(NUM_ROWS, NUM_COLS))
+
+    def get_random_block(self):
+        return self.new_block(self.feed.pop(0))
+
+SCALAR_ACTIONS = {
+    LEFT: Tetris.move_left,
+    RIGHT: Tetris.move_right,
+    DOWN: Tetris.move_down,
+    ROTATE: Tetris.rotate,
+    DROP: Tetris.hard_drop,
+}
+
+def verify(boards=64, steps=5000, seed=0):
+    # Plays the same random actions and pieces on a batch and on one Tetris
+    # per board, and compares every board after every step
+    batch = BatchTetris(boards, seed, record=True)
+    feeds = [[] for _ in range(boards)]
+
+    def deal():
+        for drawn, ids in batch.drawn:
+            for board, id in zip(drawn.tolist(), ids.tolist()):
+                feeds[board].append(id)
+        batch.drawn.clear()
+
+    deal()
+    games = [FedTetris(feeds[board]) for board in range(boards)]
+    rng = np.random.default_rng(seed)
+    # The boards are steered to the bot's placements, with a random action
+    # now and then, so rows get cleared one to four at a time and games
+    # still end
+    bot = Bot(NUM_ROWS, NUM_COLS, lookahead=False)
+    cleared = np.zeros(5, dtype=np.int64)
+    ended = 0
+    for tick in range(steps):
+        actions = steer(batch, bot)
+        noise = rng.random(boards) < 0.15
+        actions[noise] = rng.integers(0, 6, int(noise.sum()))
+        rewards, done = batch.step(actions)
+        ended += int(done.sum())
+        deal()
+        for board, game in enumerate(games):
+            score = game.score
+            lines = game.lines
+            action = SCALAR_ACTIONS.get(int(actions[board]))
+            if action is not None:
+                action(game)
+            cleared[game.lines - lines] += 1
+            if rewards[board] != game.score - score or done[board] != game.game_over:
+                raise AssertionError(f"board {board} scored differently at step {tick}")
+            if game.game_over:
+                game.reset()
+            check(batch, board, game, tick)
+        for feed in feeds:
+            if feed:
+                raise AssertionError(f"pieces left over at step {tick}")
+    print(f"{boards} boards match Tetris for {steps} steps: {cleared[1:].tolist()} clears of 1 to 4 rows, "
+          f"{ended} games ended")
+
+def steer(batch, bot):
+    # Action per board toward the bot's placement for its block
+    actions = np.full(batch.boards, DROP)
+    for board in range(batch.boards):
+        move = bot.choose(tuple(batch.rows[board].tolist()), int(batch.piece[board]))
+        if move is None:
+            continue
+        rotation, column = move
+        if batch.rotation[board] != rotation:
+            actions[board] = ROTATE
+        elif batch.column[board] < column:
+            actions[board] = RIGHT
+        elif batch.column[board] > column:
+            actions[board] = LEFT
+    return actions
+
+def check(batch, board, game, tick):
+    block = game.current_block
+    state = (list(batch.rows[board]), batch.ids[board].tobytes(), int(batch.piece[board]),
+             int(batch.next_piece[board]), int(batch.rotation[board]), int(batch.row[board]),
+             int(batch.column[board]), int(batch.score[board]), int(batch.lines[board]))
+    expected = (game.board.rows, bytes(game.board.ids), block.id, game.next_block.id, block.rotation_state,
+                block.row_offset, block.column_offset, game.score, game.lines)
+    if state != expected:
+        raise AssertionError(f"board {board} differs from Tetris at step {tick}")
+
+def benchmark(boards=1024, steps=2000, seed=0):
+    batch = BatchTetris(boards, seed)
+    rng = np.random.default_rng(seed)
+    actions = rng.integers(0, 6, (steps, boards))
+    began = time.perf_counter()
+    for tick in range(steps):
+        batch.step(actions[tick])
+    elapsed = time.perf_counter() - began
+    print(f"{boards} boards, {steps} steps: {boards * steps / elapsed:,.0f} board steps/s, "
+          f"{elapsed / steps * 1000:.3f} ms per batch step")
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch Tetris environment")
+    parser.add_argument("--boards", type=int, default=1024)
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verify", action="store_true", help="compare every board with the scalar engine")
+    args = parser.parse_args()
+    if args.verify:
+        verify(min(args.boards, 64), args.steps, args.seed)
+    else:
+        benchmark(args.boards, args.steps, args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import json
+import platform
+import sys
+import time
+from engine import Tetris
+from bot import Bot, play
+
+# Headless bot benchmark: plays games with the placement search bot and
+# reports how many placements it scores per second.
+#
+#   python benchmark.py --games 1000 --pieces 100 > run.json
+#   python benchmark.py --no-lookahead
+#
+# Game n is played with seed n, so two runs with the same arguments play the
+# same games. The bot seldom loses, so every game stops after --pieces
+# blocks. One bot plays all games, its caches carry over from game to game.
+
+def run(games, pieces, lookahead):
+    bot = Bot(lookahead=lookahead)
+    scores = []
+    lines = 0
+    placed = 0
+    lost = 0
+    began = time.perf_counter()
+    for seed in range(games):
+        game = play(Tetris(seed), bot, pieces)
+        scores.append(game.score)
+        lines += game.lines
+        placed += game.pieces
+        lost += game.game_over
+    elapsed = time.perf_counter() - began
+    return {
+        "games": games,
+        "pieces_per_game": pieces,
+        "lookahead": lookahead,
+        "seconds": elapsed,
+        "pieces": placed,
+        "lines": lines,
+        "games_lost": lost,
+        "mean_score": sum(scores) / games,
+        "placements_evaluated": bot.evaluated,
+        "placements_per_second": bot.evaluated / elapsed,
+        "pieces_per_second": placed / elapsed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless Tetris bot benchmark")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--pieces", type=int, default=100, help="blocks per game at most")
+    parser.add_argument("--no-lookahead", action="store_true", help="search the current block only")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    result = run(args.games, args.pieces, not args.no_lookahead)
+    print(f"{result['games']} games, {result['pieces']} pieces, {result['lines']} lines in {result['seconds']:.1f} s: "
+          f"{result['placements_per_second']:.0f} placements/s", file=sys.stderr)
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "result": result,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# Tetris playfield as one integer bitmask per row.
+#
+# Bit c of rows[r] is set when the cell in row r, column c is taken, so a
+# full row is rows[r] == full, a piece given as one mask per row fits when
+# none of its shifted masks overlap the rows under it, and clearing rows is
+# rebuilding a short list of integers. Which piece a cell came from is only
+# needed for drawing and is kept apart in ids, one byte per cell.
+#
+# heights[c] is how many rows column c is filled up to, counted from the
+# bottom up to its highest taken cell. It follows every change, so how far a
+# piece drops is a look at the columns it covers instead of a fit test per
+# row.
+
+class Bitboard:
+    def __init__(self, num_rows=20, num_cols=10):
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.full = (1 << num_cols) - 1
+        self.rows = [0] * num_rows
+        self.ids = bytearray(num_rows * num_cols)
+        self.heights = [0] * num_cols
+        # Goes up on every change, so a drawing of the board can tell it is
+        # out of date
+        self.version = 0
+
+    def is_inside(self, row, column):
+        return 0 <= row < self.num_rows and 0 <= column < self.num_cols
+
+    def is_empty(self, row, column):
+        return not self.rows[row] >> column & 1
+
+    def is_row_full(self, row):
+        return self.rows[row] == self.full
+
+    def get(self, row, column):
+        return self.ids[row * self.num_cols + column]
+
+    def set(self, row, column, id):
+        if id:
+            self.rows[row] |= 1 << column
+            self.heights[column] = max(self.heights[column], self.num_rows - row)
+        else:
+            self.rows[row] &= ~(1 << column)
+            if self.heights[column] == self.num_rows - row:
+                self.update_heights()
+        self.ids[row * self.num_cols + column] = id
+        self.version += 1
+
+    def fits(self, masks, row, column):
+        # masks[i] is the piece's row i, bit 0 at column. The piece fits when
+        # every set bit lands inside the board on an empty cell.
+        for mask in masks:
+            if mask:
+                if not 0 <= row < self.num_rows:
+                    return False
+                if column >= 0:
+                    shifted = mask << column
+                elif mask & ((1 << -column) - 1):
+                    return False
+                else:
+                    shifted = mask >> -column
+                if shifted & ~self.full or shifted & self.rows[row]:
+                    return False
+            row += 1
+        return True
+
+    def fits_cells(self, cells):
+        # Same for a piece given as (row, column) cells
+        for row, column in cells:
+            if not (0 <= row < self.num_rows and 0 <= column < self.num_cols) or self.rows[row] >> column & 1:
+                return False
+        return True
+
+    def drop_distance(self, floor, row, column):
+        # Rows a piece at row and column falls before landing, floor as in
+        # shapes.py. None when part of it is under an overhang, below the
+        # top of a column, where the heights cannot tell.
+        distance = self.num_rows
+        for box_column, box_row in floor:
+            top = self.num_rows - self.heights[column + box_column]
+            bottom = row + box_row
+            if bottom >= top:
+                return None
+            distance = min(distance, top - 1 - bottom)
+        return distance
+
+    def update_heights(self):
+        # From the rows, top down, a column's height is set by the first row
+        # it is taken in
+        heights = [0] * self.num_cols
+        seen = 0
+        for row, mask in enumerate(self.rows):
+            new = mask & ~seen
+            while new:
+                heights[(new & -new).bit_length() - 1] = self.num_rows - row
+                new &= new - 1
+            seen |= mask
+            if seen == self.full:
+                break
+        self.heights = heights
+
+    def place(self, cells, id):
+        # Returns the rows touched, the only ones that can have become full
+        touched = set()
+        for row, column in cells:
+            self.set(row, column, id)
+            touched.add(row)
+        return touched
+
+    def clear_row(self, row):
+        self.rows[row] = 0
+        start = row * self.num_cols
+        self.ids[start:start + self.num_cols] = bytes(self.num_cols)
+        self.update_heights()
+        self.version += 1
+
+    def move_row_down(self, row, num_rows):
+        cols = self.num_cols
+        self.rows[row + num_rows] = self.rows[row]
+        self.ids[(row + num_rows) * cols:(row + num_rows + 1) * cols] = self.ids[row * cols:(row + 1) * cols]
+        self.clear_row(row)
+
+    def clear_full_rows(self, rows=None):
+        # Removes the full rows and drops the rows above them, checking only
+        # the given rows when the caller knows which ones can be full
+        candidates = range(self.num_rows) if rows is None else rows
+        full = {row for row in candidates if self.rows[row] == self.full}
+        if not full:
+            return 0
+        cols = self.num_cols
+        kept = [row for row in range(self.num_rows) if row not in full]
+        self.rows = [0] * len(full) + [self.rows[row] for row in kept]
+        self.ids = bytearray(len(full) * cols) + b"".join(self.ids[row * cols:(row + 1) * cols] for row in kept)
+        self.update_heights()
+        self.version += 1
+        return len(full)
+
+    def reset(self):
+        self.rows = [0] * self.num_rows
+        self.ids = bytearray(self.num_rows * self.num_cols)
+        self.heights = [0] * self.num_cols
+        self.version += 1
+
+    def load(self, rows, ids):
+        self.rows = list(rows)
+        self.ids = bytearray(ids)
+        self.update_heights()
+        self.version += 1
@@ -1,38 +1,16 @@
 from colors import Colors
 import pygame
+from piece import Piece
 from position import Position
 
-class Block:
+class Block(Piece):
     def __init__(self, id):
-        self.id = id
-        self.cells = {}
+        super().__init__(id)
         self.cell_size = 30
-        self.row_offset = 0
-        self.column_offset = 0
-        self.rotation_state = 0
         self.colors = Colors.get_cell_colors()
 
-    def move(self, rows, columns):
-       self.row_offset += rows
-       self.column_offset += columns
-
     def get_cell_positions(self):
-        tiles = self.cells[self.rotation_state]
-        moved_tiles = []
-        for position in tiles:
-            position = Position(position.row + self.row_offset, position.column + self.column_offset)
-            moved_tiles.append(position)
-        return moved_tiles
-    
-    def rotate(self):
-       self.rotation_state += 1
-       if self.rotation_state == len(self.cells):
-          self.rotation_state = 0
-
-    def undo_rotation(self):
-       self.rotation_state -= 1
-       if self.rotation_state == 0:
-          self.rotation_state = len(self.cells) - 1
+        return [Position(row, column) for row, column in self.get_cells()]
 
     def draw(self, screen, offset_x, offset_y):
         tiles = self.get_cell_positions()
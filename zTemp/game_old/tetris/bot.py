@@ -0,0 +1,209 @@
+from shapes import ROTATIONS, SPAWN_COLUMNS
+
+# Placement search player for the headless engine.
+#
+# A placement is a rotation and a column the block can reach from where it
+# spawns, turning and sliding along the top row, and then dropping straight
+# down. Turning goes through the rotation states in order like Tetris.rotate,
+# so a state is only reached when every state before it fits at spawn too. Every placement of the current block is tried, and for each one
+# every placement of the next block on the board it leaves. The pair whose
+# final board scores best decides the move.
+#
+# Boards are tuples of row masks, as in Bitboard. Both the list of placements
+# of a block on a board and the score of a board are cached by board, and
+# the boards one move ahead are the boards of the next move, so most of the
+# search of a move was already done by the one before.
+
+# Weights of aggregate height, cleared lines, holes and bumpiness
+WEIGHTS = (-0.510066, 0.760666, -0.35663, -0.184483)
+# Entries per cache before it starts over
+CACHE_SIZE = 200000
+
+def distinct_rotations(id):
+    # Rotation states with different shapes, I, S and Z only have two and O
+    # has one
+    states = []
+    shapes = set()
+    for state, rotation in enumerate(ROTATIONS[id]):
+        masks = rotation.masks[rotation.top:]
+        shape = tuple(mask >> rotation.left for mask in masks)
+        if shape not in shapes:
+            shapes.add(shape)
+            states.append(state)
+    return states
+
+DISTINCT_ROTATIONS = {id: distinct_rotations(id) for id in ROTATIONS}
+
+class Bot:
+    def __init__(self, num_rows=20, num_cols=10, weights=WEIGHTS, lookahead=True, cache_size=CACHE_SIZE):
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.full = (1 << num_cols) - 1
+        self.weights = weights
+        self.lookahead = lookahead
+        self.cache_size = cache_size
+        self.placement_cache = {}
+        self.score_cache = {}
+        # Placements scored so far, the bot's measure of work
+        self.evaluated = 0
+        # (id, rotation state) -> [(box column, masks shifted to it)]
+        self.shifted = {}
+        for id, rotations in ROTATIONS.items():
+            for state, rotation in enumerate(rotations):
+                self.shifted[id, state] = [(column, tuple(shift(mask, column) for mask in rotation.masks))
+                                           for column in range(-rotation.left, num_cols - rotation.right)]
+
+    def choose(self, rows, id, next_id=None):
+        # Best (rotation state, box column) for block id on the board, or None
+        # when it can not be placed at all
+        best = None
+        best_value = None
+        for state, column, board, lines in self.placements(rows, id):
+            value = self.weights[1] * lines
+            if self.lookahead and next_id is not None:
+                # A board the next block does not fit on only wins when
+                # there is nothing else
+                follow = self.best_value(board, next_id)
+                value += follow if follow is not None else float("-inf")
+            else:
+                value += self.score(board)
+                self.evaluated += 1
+            if best_value is None or value > best_value:
+                best = (state, column)
+                best_value = value
+        return best
+
+    def best_value(self, rows, id):
+        best_value = None
+        for _, _, board, lines in self.placements(rows, id):
+            value = self.weights[1] * lines + self.score(board)
+            self.evaluated += 1
+            if best_value is None or value > best_value:
+                best_value = value
+        return best_value
+
+    def placements(self, rows, id):
+        # [(rotation state, box column, board after it, lines cleared)], one
+        # per distinct resulting board
+        key = (rows, id)
+        cached = self.placement_cache.get(key)
+        if cached is not None:
+            return cached
+        if len(self.placement_cache) >= self.cache_size:
+            self.placement_cache.clear()
+        found = []
+        boards = set()
+        spawn = SPAWN_COLUMNS[id]
+        turns = self.turns(rows, id)
+        for state in DISTINCT_ROTATIONS[id]:
+            if state > turns:
+                break
+            shifted = self.shifted[id, state]
+            start = spawn + ROTATIONS[id][state].left
+            # Slide along the top row both ways until something is in the way
+            reachable = [start]
+            index = start - 1
+            while index >= 0 and self.fits(rows, shifted[index][1], 0):
+                reachable.append(index)
+                index -= 1
+            index = start + 1
+            while index < len(shifted) and self.fits(rows, shifted[index][1], 0):
+                reachable.append(index)
+                index += 1
+            for index in reachable:
+                column, masks = shifted[index]
+                board, lines = self.place(rows, masks, self.drop(rows, masks))
+                if board not in boards:
+                    boards.add(board)
+                    found.append((state, column, board, lines))
+        self.placement_cache[key] = found
+        return found
+
+    def turns(self, rows, id):
+        # Last rotation state the block reaches turning at spawn, -1 when it
+        # does not even fit there. A turn that does not fit is undone, so the
+        # states after it are out of reach as well.
+        spawn = SPAWN_COLUMNS[id]
+        last = -1
+        for state in range(len(ROTATIONS[id])):
+            shifted = self.shifted[id, state]
+            start = spawn + ROTATIONS[id][state].left
+            if not 0 <= start < len(shifted) or not self.fits(rows, shifted[start][1], 0):
+                break
+            last = state
+        return last
+
+    def fits(self, rows, masks, row):
+        for mask in masks:
+            if mask and (row >= self.num_rows or rows[row] & mask):
+                return False
+            row += 1
+        return True
+
+    def drop(self, rows, masks):
+        # Lowest row the masks fall to from the top row: the first row of
+        # the board each mask row runs into, lowest of them, less one
+        landing = self.num_rows - len(masks)
+        for offset, mask in enumerate(masks):
+            if mask:
+                for row in range(offset, offset + landing + 1):
+                    if rows[row] & mask:
+                        landing = row - offset - 1
+                        break
+        return landing
+
+    def place(self, rows, masks, row):
+        board = list(rows)
+        for mask in masks:
+            if mask:
+                board[row] |= mask
+            row += 1
+        kept = [bits for bits in board if bits != self.full]
+        lines = self.num_rows - len(kept)
+        if lines:
+            kept[:0] = [0] * lines
+        return tuple(kept), lines
+
+    def score(self, rows):
+        # Weighted height, holes and bumpiness of a board, lines are added
+        # by the caller since they belong to the move
+        value = self.score_cache.get(rows)
+        if value is not None:
+            return value
+        if len(self.score_cache) >= self.cache_size:
+            self.score_cache.clear()
+        # Going down the rows, covered has a bit for every column whose top
+        # is at or above the row. A column's height is the number of rows it
+        # is covered in, and two neighbors differ in height by the number of
+        # rows only one of them is covered in, so all three sums are taken
+        # row by row without finding the heights.
+        pairs = self.full >> 1
+        covered = 0
+        height = 0
+        holes = 0
+        bumpiness = 0
+        for bits in rows:
+            if bits or covered:
+                holes += (covered & ~bits).bit_count()
+                covered |= bits
+                height += covered.bit_count()
+                bumpiness += ((covered ^ covered >> 1) & pairs).bit_count()
+        height_weight, _, holes_weight, bumpiness_weight = self.weights
+        value = height_weight * height + holes_weight * holes + bumpiness_weight * bumpiness
+        self.score_cache[rows] = value
+        return value
+
+def shift(mask, column):
+    return mask << column if column >= 0 else mask >> -column
+
+def play(game, bot, max_pieces=None):
+    # Plays a Tetris engine until the game is over or max_pieces blocks are
+    # down
+    while not game.game_over and (max_pieces is None or game.pieces < max_pieces):
+        rows = tuple(game.board.rows)
+        move = bot.choose(rows, game.current_block.id, game.next_block.id)
+        if move is None:
+            game.game_over = True
+            break
+        game.drop(*move)
+    return game
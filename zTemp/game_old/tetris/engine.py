@@ -0,0 +1,127 @@
+import random
+from bitboard import Bitboard
+from piece import Piece
+
+# Tetris rules without pygame: the board, the bag of pieces, moving, locking
+# and scoring. Game adds drawing on top, bots and benchmarks drive it
+# directly.
+
+# Order of the ids in a fresh bag, I J L O S T Z like the old block list
+BAG = (3, 2, 1, 4, 5, 6, 7)
+# Points for clearing 1 to 3 rows with one block, the game has never scored
+# a clear of 4
+LINE_SCORES = {1: 100, 2: 300, 3: 500}
+
+class Tetris:
+    def __init__(self, seed=None, board=None):
+        self.board = board if board is not None else Bitboard()
+        # Every piece of a game comes from this generator, so a seed gives
+        # the same piece sequence every time
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self.random = random.Random(self.seed)
+        self.reset()
+
+    def new_block(self, id):
+        return Piece(id)
+
+    def update_score(self, lines_cleared, move_down_points):
+        self.score += LINE_SCORES.get(lines_cleared, 0)
+        self.score += move_down_points    
+
+    def get_random_block(self):
+        if len(self.bag) == 0:
+            self.bag = list(BAG)
+        id = self.random.choice(self.bag)
+        self.bag.remove(id)
+        return self.new_block(id)
+
+    def move_left(self):
+        self.current_block.move(0, -1)
+        if self.block_fits() == False:
+            self.current_block.move(0, 1)
+
+    def move_right(self):
+        self.current_block.move(0, 1)
+        if self.block_fits() == False:
+            self.current_block.move(0, -1)
+
+    def move_down(self):
+        self.current_block.move(1, 0)
+        if self.block_fits() == False:
+            self.current_block.move(-1, 0)
+            self.lock_block()
+
+    def hard_drop(self):
+        # Drops the block as far as it goes and locks it, returns the rows
+        # it fell
+        rows = self.current_block.drop_distance(self.board)
+        self.current_block.move(rows, 0)
+        self.lock_block()
+        return rows
+
+    def ghost_cells(self):
+        # Where the block would land
+        block = self.current_block
+        rows = block.drop_distance(self.board)
+        return [(row + rows, column) for row, column in block.get_cells()]
+
+    def drop(self, rotation_state, column):
+        # Puts the block in a rotation and box column and hard drops it, the
+        # way a bot plays. Ends the game when it does not fit there.
+        block = self.current_block
+        block.rotation_state = rotation_state
+        block.column_offset = column
+        if self.block_fits() == False:
+            self.game_over = True
+            return
+        self.hard_drop()
+
+    def lock_block(self):
+        touched = self.board.place(self.current_block.get_cells(), self.current_block.id)
+        rows_cleared = self.board.clear_full_rows(touched)
+        self.lines += rows_cleared
+        self.pieces += 1
+        self.current_block = self.next_block
+        self.next_block = self.get_random_block()
+        self.update_score(rows_cleared, 0)
+        if self.block_fits() == False:
+            self.game_over = True
+
+    def reset(self):
+        self.board.reset()
+        self.bag = list(BAG)
+        self.current_block = self.get_random_block()
+        self.next_block = self.get_random_block()
+        self.game_over = False
+        self.score = 0
+        self.lines = 0
+        self.pieces = 0
+
+    # Tests the block's row masks against the bitboard, inside the board and
+    # on empty cells, without building positions
+    def block_fits(self):
+        return self.current_block.fits(self.board)
+
+    def rotate(self):
+        self.current_block.rotate()
+        if self.block_fits() == False:
+            self.current_block.undo_rotation()
+
+    def state(self):
+        # Everything the rest of the game depends on, as immutable values
+        block = self.current_block
+        return (tuple(self.board.rows), bytes(self.board.ids), block.id, block.rotation_state, block.row_offset,
+                block.column_offset, self.next_block.id, tuple(self.bag), self.random.getstate(),
+                self.score, self.lines, self.pieces, self.game_over)
+
+    def restore(self, state):
+        (rows, ids, id, rotation_state, row_offset, column_offset, next_id, bag, random_state,
+         self.score, self.lines, self.pieces, self.game_over) = state
+        self.board.load(rows, ids)
+        self.current_block = self.new_block(id)
+        self.current_block.rotation_state = rotation_state
+        self.current_block.row_offset = row_offset
+        self.current_block.column_offset = column_offset
+        self.next_block = self.new_block(next_id)
+        self.bag = list(bag)
+        self.random.setstate(random_state)
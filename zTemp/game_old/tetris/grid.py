@@ -1,19 +1,41 @@
 import pygame # Day1
 from colors import Colors
+from bitboard import Bitboard
+
+# The cells live in a Bitboard, one integer per row plus the piece ids, and
+# grid[row][column] reads and writes them through row views so code written
+# against the old list of lists keeps working.
+
+class GridRow:
+   __slots__ = ("board", "row")
+
+   def __init__(self, board, row):
+      self.board = board
+      self.row = row
+
+   def __getitem__(self, column):
+      return self.board.get(self.row, column)
+
+   def __setitem__(self, column, id):
+      self.board.set(self.row, column, id)
+
+   def __len__(self):
+      return self.board.num_cols
 
 class Grid: # Day1
    def __init__(self):
       self.num_rows = 20
       self.num_cols = 10
       self.cell_size = 30
-      self.grid = [[0 for j in range(self.num_cols)]for i in range(self.num_rows)] # Day1
+      self.board = Bitboard(self.num_rows, self.num_cols)
+      self.grid = [GridRow(self.board, row) for row in range(self.num_rows)] # Day1
       self.colors = Colors.get_cell_colors()
 
 
    def print_grid(self): # Day1
       for row in range(self.num_rows):
          for column in range(self.num_cols):
-            print(self.grid[row][column], end = " ")
+            print(self.board.get(row, column), end = " ")
          print() # Day1
 
       # def get_cell_colors(self): 
@@ -30,49 +52,45 @@ class Grid: # Day1
       #  return [dark_grey, green, red, orange, yellow, purple, cyan, blue]
 
    def is_inside(self, row, column):
-      if row >= 0 and row < self.num_rows and column >= 0 and column < self.num_cols:
-         return True
-      return False
+      return self.board.is_inside(row, column)
     
    def is_empty(self, row, column):
-      if self.grid[row][column] == 0:
-         return True
-      return False
+      return self.board.is_empty(row, column)
     
    def is_row_full(self, row):
-      for column in range(self.num_cols):
-         if self.grid[row][column] == 0:
-            return False
-      return True
+      return self.board.is_row_full(row)
     
    def clear_row(self, row):
-      for column in range(self.num_cols):
-          self.grid[row][column] == 0
+      self.board.clear_row(row)
 
    def move_row_down(self, row, num_rows):
-      for column in range(self.num_cols):
-          self.grid[row+num_rows][column] = self.grid[row][column]
-          self.grid[row][column] = 0
+      self.board.move_row_down(row, num_rows)
+
+   def get_cell(self, row, column):
+      return self.board.get(row, column)
+
+   def set_cell(self, row, column, id):
+      self.board.set(row, column, id)
+
+   def block_fits(self, positions):
+      # Inside the grid and on empty cells only
+      return self.board.fits_cells((position.row, position.column) for position in positions)
+
+   def lock(self, positions, id):
+      # Writes a landed block and clears the rows it completed
+      touched = self.board.place([(position.row, position.column) for position in positions], id)
+      return self.board.clear_full_rows(touched)
 
    def clear_full_rows(self):
-      completed = 0
-      for row in range(self.num_rows-1, 0, -1):
-         if self.is_row_full(row):
-            self.clear_row(row)
-            completed += 1
-         elif completed > 0:
-            self.move_row_down(row, completed)
-      return completed
+      return self.board.clear_full_rows()
    
    def reset(self):
-      for row in range(self.num_rows):
-         for column in range(self.num_cols):
-            self.grid[row][column] = 0
+      self.board.reset()
 
    def draw(self,screen): # Day1
        for row in range(self.num_rows):
           for column in range(self.num_cols):
-            cell_value = self.grid[row][column]
+            cell_value = self.board.get(row, column)
             cell_rect = pygame.Rect(column*self.cell_size + 11, row*self.cell_size + 11,
             self.cell_size -1, self.cell_size -1)
             pygame.draw.rect(screen, self.colors[cell_value], cell_rect) # Day1
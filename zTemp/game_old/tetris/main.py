@@ -1,6 +1,7 @@
 import pygame,sys 
 from game import Game
-from colors import Colors
+from renderer import Renderer
+from replay import Recorder, apply_input
 #from grid import Grid
 #from blocks import *
 
@@ -8,19 +9,29 @@ pygame.init()
 #dark_blue = (44,44,127)
 
 title_font = pygame.font.Font(None, 40)
-score_surface = title_font.render("Score", True, Colors.white)
-next_surface = title_font.render("Next", True, Colors.white)
-game_over_surface = title_font.render("GAME OVER", True, Colors.white)
-
-score_rect = pygame.Rect(320, 55, 170, 60)
-next_rect = pygame.Rect(320, 215, 170, 180)
 
 screen = pygame.display.set_mode((500,620))
 pygame.display.set_caption("Python Tetris") 
 
 clock = pygame.time.Clock()
 
-game = Game()
+# None for a new game every time, a number plays the same blocks again
+SEED = None
+# Where the game is recorded for replay.py, None to not record
+RECORD_PATH = None
+
+game = Game(SEED)
+# Writes every input down, only while recording
+recorder = Recorder(game, RECORD_PATH) if RECORD_PATH else None
+tick = 0
+
+def play(input):
+    if recorder is not None:
+        recorder.play(tick, input)
+    else:
+        apply_input(game, input)
+# Redraws only what changed since the last frame
+renderer = Renderer(screen, game, title_font)
 
 GAME_UPDATE = pygame.USEREVENT
 pygame.time.set_timer(GAME_UPDATE, 215)
@@ -33,41 +44,33 @@ pygame.time.set_timer(GAME_UPDATE, 215)
 while True: 
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
+            if recorder is not None:
+                recorder.save(tick)
             pygame.quit()
             sys.exit() 
         if event.type == pygame.KEYDOWN:
             if game.game_over == True:
-                game.game_over = False
-                game.reset()
+                play("X")
             if event.key == pygame.K_LEFT and game.game_over == False:
-                game.move_left()
+                play("L")
             if event.key == pygame.K_RIGHT and game.game_over == False:
-                game.move_right()
+                play("R")
             if event.key == pygame.K_DOWN and game.game_over == False:
-                game.move_down()
-                game.update_score(0, 1)
+                play("D")
             if event.key == pygame.K_UP and game.game_over == False:
-                game.rotate()
+                play("U")
+            if event.key == pygame.K_SPACE and game.game_over == False:
+                play("H")
         if event.type == GAME_UPDATE and game.game_over == False:
-            game.move_down()
+            play("G")
 
     #Drawing
-    score_value_surface = title_font.render(str(game.score), True, Colors.white)
-
-    screen.fill(Colors.dark_blue)
-    screen.blit(score_surface, (365, 20, 50, 50))
-    screen.blit(next_surface, (375, 180, 50, 50))
-    if game.game_over == True:
-        screen.blit(game_over_surface, (320, 450, 50, 50))
- 
-    pygame.draw.rect(screen, Colors.light_blue, score_rect, 0, 10)
-    screen.blit(score_value_surface, score_value_surface.get_rect(centerx = score_rect.centerx, 
-        centery = score_rect.centery))
-    pygame.draw.rect(screen, Colors.light_blue, next_rect, 0, 10)
-    game.draw(screen) 
+    dirty = renderer.draw()
     #game.move_down()
     #block.draw(screen)
 
     #screen.fill(dark_blue)
-    pygame.display.update() 
-    clock.tick(60)
\ No newline at end of file
+    if dirty:
+        pygame.display.update(dirty)
+    clock.tick(60)
+    tick += 1
\ No newline at end of file
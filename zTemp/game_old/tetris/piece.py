@@ -0,0 +1,46 @@
+from shapes import ROTATIONS, SPAWN_COLUMNS
+
+# A falling tetromino without any drawing, for the headless engine. Block
+# adds drawing on top of it.
+
+class Piece:
+    def __init__(self, id):
+        self.id = id
+        # Rotation states shared by all pieces of this id, see shapes.py
+        self.cells = ROTATIONS[id]
+        self.row_offset = 0
+        self.column_offset = SPAWN_COLUMNS[id]
+        self.rotation_state = 0
+
+    def move(self, rows, columns):
+       self.row_offset += rows
+       self.column_offset += columns
+
+    def get_cells(self):
+        tiles = self.cells[self.rotation_state].cells
+        return [(row + self.row_offset, column + self.column_offset) for row, column in tiles]
+
+    def fits(self, board):
+        # Inside the board and on empty cells, tested on the row masks
+        return board.fits(self.cells[self.rotation_state].masks, self.row_offset, self.column_offset)
+
+    def drop_distance(self, board):
+        # Rows it can fall, from the column heights
+        rotation = self.cells[self.rotation_state]
+        distance = board.drop_distance(rotation.floor, self.row_offset, self.column_offset)
+        if distance is None:
+            # Slid under an overhang, the cells below have to be tested
+            distance = 0
+            while board.fits(rotation.masks, self.row_offset + distance + 1, self.column_offset):
+                distance += 1
+        return distance
+
+    def rotate(self):
+       self.rotation_state += 1
+       if self.rotation_state == len(self.cells):
+          self.rotation_state = 0
+
+    def undo_rotation(self):
+       self.rotation_state -= 1
+       if self.rotation_state == -1:
+          self.rotation_state = len(self.cells) - 1
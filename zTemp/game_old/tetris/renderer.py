@@ -0,0 +1,166 @@
+import pygame
+from colors import Colors
+
+# Draws a Game with as little work per frame as possible.
+#
+# The static part of the screen, background, labels and panels, is drawn
+# once. The locked cells are drawn into a board surface that is only redrawn
+# when the bitboard's version changes, which happens on locks and line
+# clears. Every cell is a blit of a tile pre-rendered per color id, the score
+# text is rendered again only when the score changes, and only the parts of
+# the screen that changed are redrawn and passed to pygame.display.update.
+# A frame where nothing changed draws nothing. The ghost, where the block
+# would land, is looked up from the column heights only when the block or
+# the board changed.
+
+BOARD_OFFSET = 11
+SCORE_RECT = pygame.Rect(320, 55, 170, 60)
+NEXT_RECT = pygame.Rect(320, 215, 170, 180)
+GAME_OVER_POSITION = (320, 450)
+# How much of the block's color a ghost tile keeps over the background
+GHOST_SHADE = 0.3
+
+class Renderer:
+    def __init__(self, screen, game, font):
+        self.screen = screen
+        self.game = game
+        self.font = font
+        grid = game.grid
+        self.cell_size = grid.cell_size
+        self.tiles = []
+        self.ghost_tiles = []
+        for color in grid.colors:
+            tile = pygame.Surface((self.cell_size - 1, self.cell_size - 1)).convert()
+            tile.fill(color)
+            self.tiles.append(tile)
+            ghost = tile.copy()
+            ghost.fill(pygame.Color(Colors.dark_blue).lerp(color, GHOST_SHADE))
+            self.ghost_tiles.append(ghost)
+
+        self.background = pygame.Surface(screen.get_size()).convert()
+        self.background.fill(Colors.dark_blue)
+        self.background.blit(font.render("Score", True, Colors.white), (365, 20, 50, 50))
+        self.background.blit(font.render("Next", True, Colors.white), (375, 180, 50, 50))
+        pygame.draw.rect(self.background, Colors.light_blue, SCORE_RECT, 0, 10)
+        pygame.draw.rect(self.background, Colors.light_blue, NEXT_RECT, 0, 10)
+        self.game_over_surface = font.render("GAME OVER", True, Colors.white)
+        self.game_over_rect = self.game_over_surface.get_rect(topleft=GAME_OVER_POSITION)
+
+        self.board = pygame.Surface((grid.num_cols * self.cell_size, grid.num_rows * self.cell_size)).convert()
+        self.board.fill(Colors.dark_blue)
+        self.board_rect = self.board.get_rect(topleft=(BOARD_OFFSET, BOARD_OFFSET))
+        self.board_version = None
+        self.score = None
+        self.score_surface = None
+        # What was on screen last frame, to find what changed
+        self.block_state = None
+        self.block_rect = None
+        self.ghost_key = None
+        self.ghost_cells = None
+        self.ghost_rect = None
+        self.next_id = None
+        self.game_over = None
+        self.first = True
+
+    def draw(self):
+        # Brings the screen up to date and returns the rects that changed
+        game = self.game
+        dirty = []
+        if self.first:
+            dirty.append(self.screen.get_rect())
+            self.first = False
+
+        if self.board_version != game.grid.board.version:
+            self.redraw_board()
+            dirty.append(self.board_rect)
+
+        block = game.current_block
+        block_state = (block.id, block.rotation_state, block.row_offset, block.column_offset)
+        if block_state != self.block_state:
+            block_rect = self.cells_rect(block.get_cells(), BOARD_OFFSET, BOARD_OFFSET)
+            dirty.append(block_rect)
+            if self.block_rect is not None:
+                dirty.append(self.block_rect)
+            self.block_state = block_state
+            self.block_rect = block_rect
+
+        # Only a move sideways, a turn, a new block or a new board moves the
+        # ghost, falling does not
+        ghost_key = (block.id, block.rotation_state, block.column_offset, game.grid.board.version)
+        if ghost_key != self.ghost_key:
+            self.ghost_key = ghost_key
+            ghost_cells = game.ghost_cells()
+            if ghost_cells != self.ghost_cells:
+                ghost_rect = self.cells_rect(ghost_cells, BOARD_OFFSET, BOARD_OFFSET)
+                dirty.append(ghost_rect)
+                if self.ghost_rect is not None:
+                    dirty.append(self.ghost_rect)
+                self.ghost_cells = ghost_cells
+                self.ghost_rect = ghost_rect
+
+        if game.score != self.score:
+            self.score = game.score
+            self.score_surface = self.font.render(str(game.score), True, Colors.white)
+            dirty.append(SCORE_RECT)
+
+        if game.next_block.id != self.next_id:
+            self.next_id = game.next_block.id
+            dirty.append(NEXT_RECT)
+
+        if game.game_over != self.game_over:
+            self.game_over = game.game_over
+            dirty.append(self.game_over_rect)
+
+        for rect in dirty:
+            self.screen.set_clip(rect)
+            self.compose()
+        self.screen.set_clip(None)
+        return dirty
+
+    def redraw_board(self):
+        board = self.game.grid.board
+        size = self.cell_size
+        self.board.blits([(self.tiles[board.get(row, column)], (column * size, row * size))
+                          for row in range(board.num_rows) for column in range(board.num_cols)], False)
+        self.board_version = board.version
+
+    def compose(self):
+        # Every layer, the clip rect keeps the blits to the changed part
+        game = self.game
+        screen = self.screen
+        clip = screen.get_clip()
+        screen.blit(self.background, clip, clip)
+        if clip.colliderect(self.board_rect):
+            screen.blit(self.board, self.board_rect)
+            if not game.game_over:
+                tile = self.ghost_tiles[game.current_block.id]
+                screen.blits([(tile, (BOARD_OFFSET + column * self.cell_size, BOARD_OFFSET + row * self.cell_size))
+                              for row, column in self.ghost_cells], False)
+            self.blit_cells(game.current_block, BOARD_OFFSET, BOARD_OFFSET)
+        if clip.colliderect(SCORE_RECT):
+            screen.blit(self.score_surface, self.score_surface.get_rect(center=SCORE_RECT.center))
+        if clip.colliderect(NEXT_RECT):
+            self.blit_cells(game.next_block, *preview_offset(game.next_block.id))
+        if game.game_over and clip.colliderect(self.game_over_rect):
+            screen.blit(self.game_over_surface, self.game_over_rect)
+
+    def blit_cells(self, block, offset_x, offset_y):
+        tile = self.tiles[block.id]
+        size = self.cell_size
+        self.screen.blits([(tile, (offset_x + column * size, offset_y + row * size))
+                           for row, column in block.get_cells()], False)
+
+    def cells_rect(self, cells, offset_x, offset_y):
+        size = self.cell_size
+        rows = [row for row, _ in cells]
+        columns = [column for _, column in cells]
+        return pygame.Rect(offset_x + min(columns) * size, offset_y + min(rows) * size,
+                           (max(columns) - min(columns) + 1) * size, (max(rows) - min(rows) + 1) * size)
+
+def preview_offset(id):
+    # Where Game.draw puts the next block, I and O are centered differently
+    if id == 3:
+        return 255, 260
+    if id == 4:
+        return 255, 280
+    return 270, 270
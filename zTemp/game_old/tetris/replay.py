@@ -0,0 +1,189 @@
+import argparse
+import bisect
+import hashlib
+import json
+import sys
+import time
+from engine import Tetris
+
+# Recording and headless replay of a Tetris game.
+#
+# The pieces come from the seed given to the game, so a game is its seed and
+# the inputs that reached it, one letter each:
+#
+#   L R  move left or right     D  down key, one point
+#   U    rotate                 G  gravity, the timer moving the block down
+#   H    hard drop              X  restart after a game over
+#
+# A recording keeps them as [frames since the previous input, letters]
+# pairs, several inputs of one frame share a pair:
+#
+#   {"version": 1, "seed": ..., "ticks": ..., "score": ..., "lines": ...,
+#    "digest": ..., "events": [[13, "G"], [4, "L"], [0, "U"], ...]}
+#
+# score and digest are what the game ended with, a replay has to come to the
+# same ones. Replaying runs on the engine without pygame, and keeps the state
+# every so many ticks so seeking to any tick replays at most that many.
+#
+#   python replay.py game.replay
+#   python replay.py game.replay --seek 3000
+
+VERSION = 1
+# Ticks between kept states when seeking
+CHECKPOINT_INTERVAL = 600
+
+def apply_input(game, input):
+    # What the keys and the timer in main.py do
+    if input == "X":
+        game.reset()
+        return
+    if game.game_over:
+        return
+    if input == "L":
+        game.move_left()
+    elif input == "R":
+        game.move_right()
+    elif input == "D":
+        game.move_down()
+        game.update_score(0, 1)
+    elif input == "U":
+        game.rotate()
+    elif input == "G":
+        game.move_down()
+    elif input == "H":
+        game.hard_drop()
+    else:
+        raise ValueError(f"Unknown input {input!r}")
+
+class Recorder:
+    def __init__(self, game, path):
+        self.game = game
+        self.path = path
+        self.recording = {"version": VERSION, "seed": game.seed, "events": []}
+        self.tick = 0
+
+    def play(self, tick, input):
+        # Applies an input to the game and writes it down
+        events = self.recording["events"]
+        if events and tick == self.tick:
+            events[-1][1] += input
+        else:
+            events.append([tick - self.tick, input])
+        self.tick = tick
+        apply_input(self.game, input)
+
+    def save(self, tick):
+        game = self.game
+        self.recording.update(ticks=tick, score=game.score, lines=game.lines, digest=digest(game))
+        with open(self.path, "w") as file:
+            json.dump(self.recording, file, separators=(",", ":"))
+
+def load(path):
+    with open(path) as file:
+        recording = json.load(file)
+    if recording.get("version") != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} recording")
+    return recording
+
+def digest(game):
+    # The board and the blocks, enough to tell two games apart
+    block = game.current_block
+    state = (block.id, block.rotation_state, block.row_offset, block.column_offset,
+             game.next_block.id, game.score, game.lines, game.pieces, game.game_over)
+    return hashlib.sha1(bytes(game.board.ids) + repr(state).encode()).hexdigest()
+
+class Replayer:
+    def __init__(self, recording, interval=CHECKPOINT_INTERVAL):
+        self.recording = recording
+        self.game = Tetris(recording["seed"])
+        self.interval = interval
+        # Absolute tick of every input
+        self.ticks = []
+        self.inputs = []
+        tick = 0
+        for delta, inputs in recording["events"]:
+            tick += delta
+            for input in inputs:
+                self.ticks.append(tick)
+                self.inputs.append(input)
+        self.end = max(recording.get("ticks", 0), tick)
+        # (tick, inputs applied, state) in tick order, the start always first
+        self.checkpoints = [(0, 0, self.game.state())]
+        self.tick = 0
+        self.index = 0
+
+    def run(self, tick=None):
+        # Plays forward up to and including tick, keeping a checkpoint at
+        # every interval passed on the way
+        tick = self.end if tick is None else tick
+        game = self.game
+        ticks = self.ticks
+        inputs = self.inputs
+        index = self.index
+        next_checkpoint = (self.tick // self.interval + 1) * self.interval
+        while index < len(ticks) and ticks[index] <= tick:
+            if ticks[index] >= next_checkpoint:
+                self.checkpoint(next_checkpoint, index)
+                next_checkpoint = (ticks[index] // self.interval + 1) * self.interval
+            apply_input(game, inputs[index])
+            index += 1
+        self.index = index
+        self.tick = max(self.tick, tick)
+
+    def checkpoint(self, tick, index):
+        if tick > self.checkpoints[-1][0]:
+            self.checkpoints.append((tick, index, self.game.state()))
+
+    def seek(self, tick):
+        # The game as it was at the end of tick, from the last checkpoint
+        # before it
+        checkpoints = self.checkpoints
+        if tick > checkpoints[-1][0]:
+            start = len(checkpoints) - 1
+        else:
+            start = bisect.bisect_right(checkpoints, tick, key=lambda checkpoint: checkpoint[0]) - 1
+        checkpoint_tick, self.index, state = checkpoints[start]
+        self.game.restore(state)
+        self.tick = checkpoint_tick
+        self.run(tick)
+        return self.game
+
+    def verify(self):
+        # Plays the whole game and tells whether it ends like the recording
+        self.seek(self.end)
+        return self.game.score == self.recording["score"] and digest(self.game) == self.recording["digest"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded Tetris game")
+    parser.add_argument("path")
+    parser.add_argument("--seek", type=int, help="show the game at this tick instead")
+    args = parser.parse_args()
+
+    recording = load(args.path)
+    replayer = Replayer(recording)
+    began = time.perf_counter()
+    matches = replayer.verify()
+    elapsed = time.perf_counter() - began
+    game = replayer.game
+    print(f"{replayer.end} ticks, {len(replayer.inputs)} inputs in {elapsed * 1000:.1f} ms, "
+          f"{replayer.end / 60 / max(elapsed, 1e-9):.0f}x real time")
+    print(f"score {game.score}, {game.lines} lines, {game.pieces} pieces")
+    if "score" in recording:
+        print("matches the recording" if matches else f"does not match, recorded score {recording['score']}")
+
+    if args.seek is not None:
+        began = time.perf_counter()
+        game = replayer.seek(args.seek)
+        elapsed = time.perf_counter() - began
+        print(f"tick {args.seek} in {elapsed * 1000:.2f} ms: score {game.score}, {game.lines} lines")
+        board = game.board
+        cells = set(game.current_block.get_cells())
+        for row in range(board.num_rows):
+            print("".join("#" if (row, column) in cells else "o" if board.get(row, column) else "."
+                          for column in range(board.num_cols)))
+
+    if "score" in recording and not matches:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
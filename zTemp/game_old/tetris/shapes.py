@@ -0,0 +1,62 @@
+# Rotation states of every tetromino, built once at import.
+#
+# Each state keeps its cells as (row, column) offsets inside the piece's box
+# and the same cells as one bitmask per box row, bit 0 at the box's left
+# column, so a fit test is a Bitboard.fits call with no objects built. floor
+# is the lowest cell of every box column the state covers, what lands first
+# when it drops.
+
+# Block id -> cells of rotation states 0 to 3
+CELLS = {
+    1: (((0, 2), (1, 0), (1, 1), (1, 2)),  # L
+        ((0, 1), (1, 1), (2, 1), (2, 2)),
+        ((1, 0), (1, 1), (1, 2), (2, 0)),
+        ((0, 0), (0, 1), (1, 1), (2, 1))),
+    2: (((0, 0), (1, 0), (1, 1), (1, 2)),  # J
+        ((0, 1), (0, 2), (1, 1), (2, 1)),
+        ((1, 0), (1, 1), (1, 2), (2, 2)),
+        ((0, 1), (1, 1), (2, 0), (2, 1))),
+    3: (((1, 0), (1, 1), (1, 2), (1, 3)),  # I
+        ((0, 2), (1, 2), (2, 2), (3, 2)),
+        ((2, 0), (2, 1), (2, 2), (2, 3)),
+        ((0, 1), (1, 1), (2, 1), (3, 1))),
+    4: (((0, 0), (0, 1), (1, 0), (1, 1)),  # O
+        ((0, 0), (0, 1), (1, 0), (1, 1)),
+        ((0, 0), (0, 1), (1, 0), (1, 1)),
+        ((0, 0), (0, 1), (1, 0), (1, 1))),
+    5: (((0, 1), (0, 2), (1, 0), (1, 1)),  # S
+        ((0, 1), (1, 1), (1, 2), (2, 2)),
+        ((1, 1), (1, 2), (2, 0), (2, 1)),
+        ((0, 0), (1, 0), (1, 1), (2, 1))),
+    6: (((0, 1), (1, 0), (1, 1), (1, 2)),  # T
+        ((0, 1), (1, 1), (1, 2), (2, 1)),
+        ((1, 0), (1, 1), (1, 2), (2, 1)),
+        ((0, 1), (1, 0), (1, 1), (2, 1))),
+    7: (((0, 0), (0, 1), (1, 1), (1, 2)),  # Z
+        ((0, 2), (1, 1), (1, 2), (2, 1)),
+        ((1, 0), (1, 1), (2, 1), (2, 2)),
+        ((0, 1), (1, 0), (1, 1), (2, 0))),
+}
+
+# Box column every block spawns at
+SPAWN_COLUMNS = {1: 3, 2: 3, 3: 3, 4: 4, 5: 3, 6: 3, 7: 3}
+
+class Rotation:
+    __slots__ = ("cells", "masks", "floor", "top", "bottom", "left", "right")
+
+    def __init__(self, cells):
+        self.cells = cells
+        self.top = min(row for row, _ in cells)
+        self.bottom = max(row for row, _ in cells)
+        self.left = min(column for _, column in cells)
+        self.right = max(column for _, column in cells)
+        masks = [0] * (self.bottom + 1)
+        for row, column in cells:
+            masks[row] |= 1 << column
+        self.masks = tuple(masks)
+        # (box column, lowest box row) per column
+        self.floor = tuple((column, max(row for row, other in cells if other == column))
+                           for column in range(self.left, self.right + 1))
+
+# Block id -> tuple of its Rotation states
+ROTATIONS = {id: tuple(Rotation(cells) for cells in states) for id, states in CELLS.items()}
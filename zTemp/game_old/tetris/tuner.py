@@ -0,0 +1,146 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from engine import Tetris
+from bot import Bot, WEIGHTS, play
+
+# Self-play tuner for the bot's weights, by the cross-entropy method.
+#
+# Every generation draws a population of weight vectors from a normal
+# distribution per weight, lets each play the same seeded games and moves
+# the distribution to the mean and spread of the best ones. The games of all
+# candidates are spread over a process pool one game per task, so the work
+# divides evenly whatever the number of cores.
+#
+#   python tuner.py --generations 30 --population 32 --games 16 --workers 8
+#
+# Every result is appended to the output file as one JSON line:
+#
+#   {"type": "candidate", "generation": 3, "index": 7, "weights": [...], "fitness": 212.5}
+#   {"type": "generation", "generation": 3, "mean": [...], "std": [...], "best": {...}}
+#
+# A generation line is the checkpoint. Running again with the same arguments
+# and output file picks up after the last one, and the candidates of an
+# unfinished generation already in the file are not played again: candidates
+# and game seeds follow from --seed and the generation number alone.
+
+OUTPUT_PATH = "tuning.jsonl"
+# Spread of the first generation around the default weights, and the least
+# spread kept so the search does not stall
+START_STD = 0.5
+MIN_STD = 0.01
+
+def play_game(task):
+    weights, seed, pieces, lookahead = task
+    game = play(Tetris(seed), Bot(weights=weights, lookahead=lookahead), pieces)
+    return game.lines
+
+def candidates(seed, generation, mean, std, population):
+    rng = random.Random(f"{seed}-{generation}")
+    return [[rng.gauss(mu, sigma) for mu, sigma in zip(mean, std)] for _ in range(population)]
+
+def game_seeds(seed, generation, games):
+    # Every candidate of a generation plays the same games
+    rng = random.Random(f"{seed}-{generation}-games")
+    return [rng.getrandbits(32) for _ in range(games)]
+
+def load(path):
+    # (last checkpoint or None, {index: fitness} of the generation after it)
+    checkpoint = None
+    finished = {}
+    if not os.path.exists(path):
+        return checkpoint, finished
+    good = 0
+    with open(path, "rb") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Half a line left by a run that was killed while writing
+                break
+            good += len(line)
+            if record["type"] == "generation":
+                checkpoint = record
+                finished = {}
+            elif record["type"] == "candidate":
+                finished[record["index"]] = record["fitness"]
+    # New lines go right after the last whole one
+    os.truncate(path, good)
+    return checkpoint, finished
+
+def tune(args):
+    checkpoint, finished = load(args.output)
+    if checkpoint is None:
+        generation = 0
+        mean = list(WEIGHTS)
+        std = [START_STD] * len(WEIGHTS)
+    else:
+        generation = checkpoint["generation"] + 1
+        mean = checkpoint["mean"]
+        std = checkpoint["std"]
+        print(f"Resuming at generation {generation}, {len(finished)} candidates already played", file=sys.stderr)
+
+    elite = max(1, int(args.population * args.elite))
+    pool = multiprocessing.Pool(args.workers)
+    try:
+        with open(args.output, "a") as output:
+            while generation < args.generations:
+                began = time.perf_counter()
+                population = candidates(args.seed, generation, mean, std, args.population)
+                seeds = game_seeds(args.seed, generation, args.games)
+                pending = [index for index in range(args.population) if index not in finished]
+                tasks = [(population[index], seed, args.pieces, args.lookahead) for index in pending for seed in seeds]
+                # Results come back in task order, a candidate is written as
+                # soon as its last game is in
+                lines = pool.imap(play_game, tasks, chunksize=max(1, len(tasks) // (4 * args.workers)))
+                fitness = dict(finished)
+                for index in pending:
+                    fitness[index] = sum(next(lines) for _ in seeds) / args.games
+                    write(output, {"type": "candidate", "generation": generation, "index": index,
+                                   "weights": population[index], "fitness": fitness[index]})
+
+                ranked = sorted(range(args.population), key=lambda index: fitness[index], reverse=True)
+                best = [population[index] for index in ranked[:elite]]
+                mean = [sum(weights[column] for weights in best) / elite for column in range(len(mean))]
+                std = [max(math.sqrt(sum((weights[column] - mean[column]) ** 2 for weights in best) / elite), MIN_STD)
+                       for column in range(len(mean))]
+                top = ranked[0]
+                write(output, {"type": "generation", "generation": generation, "mean": mean, "std": std,
+                               "best": {"weights": population[top], "fitness": fitness[top]},
+                               "games_per_second": len(tasks) / (time.perf_counter() - began)})
+                print(f"generation {generation}: best {fitness[top]:.1f} lines, "
+                      f"elite mean {sum(fitness[index] for index in ranked[:elite]) / elite:.1f}", file=sys.stderr)
+                finished = {}
+                generation += 1
+    finally:
+        pool.close()
+        pool.join()
+    return mean
+
+def write(output, record):
+    # Flushed line by line so a run stopped at any point can be resumed
+    output.write(json.dumps(record) + "\n")
+    output.flush()
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the Tetris bot's weights by self-play")
+    parser.add_argument("--generations", type=int, default=20)
+    parser.add_argument("--population", type=int, default=24)
+    parser.add_argument("--elite", type=float, default=0.25, help="share of the population the next one is fitted to")
+    parser.add_argument("--games", type=int, default=8, help="games per candidate")
+    parser.add_argument("--pieces", type=int, default=500, help="blocks per game at most")
+    parser.add_argument("--lookahead", action="store_true", help="let candidates search the next block too")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    args = parser.parse_args()
+    mean = tune(args)
+    print(json.dumps({"weights": mean}))
+
+if __name__ == "__main__":
+    main()